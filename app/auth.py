@@ -1,14 +1,77 @@
-from typing import Annotated
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Annotated, Any
 
 from anyio.to_thread import run_sync
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from firebase_admin import auth
 
 from app.settings import settings
+from app.utilities import metrics
+from app.utilities.breaker import CircuitBreaker
+from app.utilities.clients import init_firebase
+from app.utilities.deadline import client_timed_out, is_timeout, remaining
+from app.utilities.tracing import tracer
 
 security = HTTPBearer()
 
+firebase_breaker = CircuitBreaker(
+    "firebase",
+    failure_threshold=settings.breaker_failure_threshold,
+    reset_timeout=settings.breaker_reset_timeout,
+)
+
+# ID token -> (user id, expiry as a unix timestamp), least recently used first.
+verified_tokens: OrderedDict[str, tuple[str | None, float]] = OrderedDict()
+
+metrics.register("auth_tokens", lambda: {"cached": len(verified_tokens)})
+
+
+def verify_id_token(id_token: str) -> dict[str, Any]:
+    """
+    Verify a Firebase ID token, initializing Firebase on first use.
+    """
+    from firebase_admin import auth
+
+    init_firebase()
+    claims: dict[str, Any] = auth.verify_id_token(id_token)
+    return claims
+
+
+def provider_failed(error: Exception) -> bool:
+    """
+    Whether verification failed because of Firebase rather than the token.
+    """
+    if is_timeout(error):
+        return True
+
+    from firebase_admin import auth
+
+    return isinstance(error, auth.CertificateFetchError)
+
+
+def remember_token(id_token: str, user_id: str | None, expires_at: float) -> None:
+    """
+    Cache a verified token until it expires.
+    """
+    verified_tokens[id_token] = (user_id, expires_at)
+    verified_tokens.move_to_end(id_token)
+    if len(verified_tokens) > settings.auth_token_cache_size:
+        verified_tokens.popitem(last=False)
+
+
+def is_verified(id_token: str) -> bool:
+    """
+    Whether `validate_access` verified the token before and it has not
+    expired yet, without calling Firebase.
+    """
+    if settings.testing:
+        return id_token == settings.static_token
+
+    cached = verified_tokens.get(id_token)
+    return bool(cached and cached[1] > time.time())
+
 
 async def validate_access(
     access_token: Annotated[HTTPAuthorizationCredentials, Depends(security)]
@@ -16,20 +79,57 @@ async def validate_access(
     """
     Validates access tokens.
 
-    Raises a 401 HTTPException if an invalid token is provided.
+    Tokens verified before are trusted until they expire, so users keep
+    working while Firebase is unavailable. Raises a 401 HTTPException if an
+    invalid token is provided, or a 503 when Firebase cannot verify it.
     """
     if settings.testing:
         if access_token.credentials == settings.static_token:
             return "tester"
     else:
+        cached = verified_tokens.get(access_token.credentials)
+        if cached and cached[1] > time.time():
+            verified_tokens.move_to_end(access_token.credentials)
+            return cached[0]
+
+        firebase_breaker.before()
         try:
-            user_result = await run_sync(auth.verify_id_token, access_token.credentials)
+            with tracer.span("auth.verify_id_token"):
+                user_result = await asyncio.wait_for(
+                    run_sync(
+                        verify_id_token,
+                        access_token.credentials,
+                        abandon_on_cancel=True,
+                    ),
+                    remaining(),
+                )
+        except Exception as e:
+            if client_timed_out(e):
+                firebase_breaker.cancel()
+                raise
+            if provider_failed(e):
+                firebase_breaker.failure()
+                if is_timeout(e):
+                    raise
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Service unavailable.",
+                )
+
+            firebase_breaker.success()
+            print(e)
+        except BaseException:
+            # Cancelled, like when the client went away.
+            firebase_breaker.cancel()
+            raise
+        else:
+            firebase_breaker.success()
             if user_result:
                 user_id: str | None = user_result.get("user_id")
+                remember_token(
+                    access_token.credentials, user_id, user_result.get("exp", 0)
+                )
 
                 return user_id
 
-        except Exception as e:
-            print(e)
-
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
@@ -1,27 +1,71 @@
 import time
-from typing import Any, Callable, TypeVar
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, TypeVar
 
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import (
     HTTPBearer,
 )
 
+from app.auth import is_verified
 from app.routers.auth import auth
 from app.routers.logs import logs
+from app.routers.metrics import metrics
 from app.routers.pets import pets
+from app.settings import settings
 
+from .utilities.breaker import CircuitOpen
+from .utilities.clients import close_http_client, init_firebase
+from .utilities.compression import CompressionMiddleware
+from .utilities.concurrency import ConcurrencyLimitMiddleware
+from .utilities.deadline import DeadlineExceeded
+from .utilities.indexes import create_indexes
 from .utilities.log import logger
+from .utilities.tracing import TracingMiddleware, current_span, tracer
 
 security = HTTPBearer()
 F = TypeVar("F", bound=Callable[..., Any])
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Prepare the database before serving requests, flush pending writes and
+    close clients on shutdown.
+    """
+    await create_indexes()
+    if not settings.testing:
+        init_firebase()
+    if settings.log_insert_batch_size > 1:
+        logs.log_inserts.start()
+
+    yield
+
+    await logs.log_inserts.stop()
+    await close_http_client()
+    tracer.close()
+
+
 app = FastAPI(
     title="💩 Poopyrus",
     description="We don't take shit.. we track it.",
     version="1.0.0",
     docs_url="/",
+    lifespan=lifespan,
+)
+
+
+app.add_middleware(
+    ConcurrencyLimitMiddleware,
+    initial_limit=settings.concurrency_initial_limit,
+    min_limit=settings.concurrency_min_limit,
+    max_limit=settings.concurrency_max_limit,
+    target_latency_ms=settings.concurrency_target_latency_ms,
+    reserve=settings.concurrency_reserve,
+    tolerance=settings.concurrency_latency_tolerance,
+    verified=is_verified,
 )
 
 
@@ -49,17 +93,56 @@ async def process_time_log_middleware(request: Request, call_next: F) -> Respons
     process_time = str(round(time.time() - start_time, 3))
     response.headers["X-Process-Time"] = process_time
 
+    span = current_span.get()
     logger.info(
-        "Method=%s Path=%s StatusCode=%s ProcessTime=%s",
+        "Method=%s Path=%s StatusCode=%s ProcessTime=%s TraceId=%s",
         request.method,
         request.url.path,
         response.status_code,
         process_time,
+        span.trace_id if span else None,
     )
 
     return response
 
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    cache_size=settings.compression_cache_size,
+    cache_bytes=settings.compression_cache_bytes,
+)
+
+
+app.add_middleware(TracingMiddleware)
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(
+    request: Request, exc: DeadlineExceeded
+) -> JSONResponse:
+    """
+    Fail fast once a request runs out of time
+    """
+    return JSONResponse(
+        {"detail": "Deadline exceeded."},
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+    )
+
+
+@app.exception_handler(CircuitOpen)
+async def circuit_open_handler(request: Request, exc: CircuitOpen) -> JSONResponse:
+    """
+    Fail fast while a dependency is down
+    """
+    return JSONResponse(
+        {"detail": "Service unavailable."},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 app.include_router(auth.router)
 app.include_router(logs.router)
 app.include_router(pets.router)
+app.include_router(metrics.router)
@@ -0,0 +1,68 @@
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from app.auth import validate_access
+from app.settings import settings
+from app.utilities.rate_limit import (
+    Budget,
+    MemoryRateLimitBackend,
+    RateLimiter,
+    RateLimitResult,
+)
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+limiter = RateLimiter(
+    MemoryRateLimitBackend(max_keys=settings.rate_limit_max_keys),
+    {
+        "read": Budget(settings.rate_limit_read_rate, settings.rate_limit_read_burst),
+        "write": Budget(
+            settings.rate_limit_write_rate, settings.rate_limit_write_burst
+        ),
+        "login": Budget(
+            settings.rate_limit_login_rate, settings.rate_limit_login_burst
+        ),
+    },
+)
+
+
+def apply_rate_limit(result: RateLimitResult, response: Response) -> None:
+    """
+    Add rate limit headers, raising a 429 HTTPException when out of tokens.
+    """
+    headers = {
+        "RateLimit-Limit": str(result.limit),
+        "RateLimit-Remaining": str(result.remaining),
+        "RateLimit-Reset": str(result.reset),
+    }
+
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests.",
+            headers=headers | {"Retry-After": str(result.retry_after)},
+        )
+
+    response.headers.update(headers)
+
+
+async def rate_limit_user(
+    request: Request,
+    response: Response,
+    user_id: Annotated[None | str, Depends(validate_access)],
+) -> None:
+    """
+    Rate limits authenticated calls per user, with separate read and write
+    budgets.
+    """
+    budget = "read" if request.method in READ_METHODS else "write"
+    apply_rate_limit(await limiter.acquire(budget, f"user:{user_id}"), response)
+
+
+async def rate_limit_login(request: Request, response: Response) -> None:
+    """
+    Rate limits logins per client IP.
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    apply_rate_limit(await limiter.acquire("login", f"ip:{client_ip}"), response)
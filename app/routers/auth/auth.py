@@ -1,6 +1,5 @@
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated, Any
 
-import httpx
 from fastapi import (
     APIRouter,
     Depends,
@@ -13,24 +12,96 @@ from fastapi.security import (
 )
 
 from app.models import GenericException
+from app.rate_limit import rate_limit_login
 from app.settings import settings
+from app.utilities.breaker import CircuitBreaker
+from app.utilities.clients import get_http_client
+from app.utilities.deadline import (
+    DeadlineRoute,
+    client_timed_out,
+    is_timeout,
+    remaining,
+)
+
+from .models import LoginResult, RefreshRequest
 
-from .models import LoginResult
+if TYPE_CHECKING:
+    import httpx
 
 router = APIRouter(
     prefix="/v1/auth",
     tags=["auth"],
+    route_class=DeadlineRoute,
 )
 
 
 basic_security = HTTPBasic()
 
+identitytoolkit_breaker = CircuitBreaker(
+    "identitytoolkit",
+    failure_threshold=settings.breaker_failure_threshold,
+    reset_timeout=settings.breaker_reset_timeout,
+)
+securetoken_breaker = CircuitBreaker(
+    "securetoken",
+    failure_threshold=settings.breaker_failure_threshold,
+    reset_timeout=settings.breaker_reset_timeout,
+)
+
+
+async def post_to_google(
+    breaker: CircuitBreaker, url: str, **kwargs: Any
+) -> "httpx.Response":
+    """
+    POST to a Google auth API through its circuit breaker. Failed requests
+    and server errors count as failures, cancellations and running out of a
+    deadline the client shortened do not.
+
+    Google being unreachable or answering with a server error raises a 503
+    HTTPException, rather than passing for bad credentials.
+    """
+    import httpx
+
+    breaker.before()
+    try:
+        r = await get_http_client().post(
+            url,
+            params={"key": settings.google_auth_sign_in_key},
+            timeout=remaining(5),
+            **kwargs,
+        )
+    except BaseException as e:
+        if not isinstance(e, Exception) or client_timed_out(e):
+            breaker.cancel()
+            raise
+
+        breaker.failure()
+        if isinstance(e, httpx.TransportError) and not is_timeout(e):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Service unavailable.",
+            ) from e
+        raise
+
+    breaker.record(r.status_code < 500)
+    if r.status_code >= 500:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service unavailable.",
+        )
+
+    return r
+
 
 @router.get(
     "/login",
     response_model=LoginResult,
+    dependencies=[Depends(rate_limit_login)],
     responses={
         401: {"description": "Unauthorized", "model": GenericException},
+        429: {"description": "Too many requests.", "model": GenericException},
+        503: {"description": "Service unavailable.", "model": GenericException},
+        504: {"description": "Deadline exceeded.", "model": GenericException},
     },
 )
 async def login(
@@ -40,26 +111,72 @@ async def login(
     Email Login
     """
 
-    async with httpx.AsyncClient() as client:
-        r = await client.post(
-            settings.google_auth_sign_in_url,
-            params={"key": settings.google_auth_sign_in_key},
-            json={
-                "email": credentials.username,
-                "password": credentials.password,
-                "returnSecureToken": True,
-            },
-        )
+    r = await post_to_google(
+        identitytoolkit_breaker,
+        settings.google_auth_sign_in_url,
+        json={
+            "email": credentials.username,
+            "password": credentials.password,
+            "returnSecureToken": True,
+        },
+    )
+
+    if r.is_success:
+        data = r.json()
+        access_token: str | None = data.get("idToken")
+        expires_in: str | None = data.get("expiresIn")
+        refresh_token: str | None = data.get("refreshToken")
+
+        if access_token and expires_in and refresh_token:
+            return LoginResult(
+                access_token=access_token,
+                expires_in=int(expires_in),
+                refresh_token=refresh_token,
+            )
+
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Unauthorized",
+    )
+
+
+@router.post(
+    "/refresh",
+    response_model=LoginResult,
+    dependencies=[Depends(rate_limit_login)],
+    responses={
+        401: {"description": "Unauthorized", "model": GenericException},
+        429: {"description": "Too many requests.", "model": GenericException},
+        503: {"description": "Service unavailable.", "model": GenericException},
+        504: {"description": "Deadline exceeded.", "model": GenericException},
+    },
+)
+async def refresh(refresh_request: RefreshRequest) -> LoginResult:
+    """
+    Exchange a refresh token from login for a new access token
+    """
+
+    r = await post_to_google(
+        securetoken_breaker,
+        settings.google_auth_refresh_url,
+        data={
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_request.refresh_token,
+        },
+    )
 
-        if r.is_success:
-            data = r.json()
-            access_token: str | None = data.get("idToken")
-            expires_in: str | None = data.get("expiresIn")
+    if r.is_success:
+        data = r.json()
+        access_token: str | None = data.get("id_token")
+        expires_in: str | None = data.get("expires_in")
+        refresh_token: str | None = data.get("refresh_token")
 
-            if access_token and expires_in:
-                return LoginResult(
-                    access_token=access_token, expires_in=int(expires_in)
-                )
+        if access_token and expires_in and refresh_token:
+            return LoginResult(
+                access_token=access_token,
+                expires_in=int(expires_in),
+                refresh_token=refresh_token,
+            )
 
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -4,3 +4,8 @@ from pydantic import BaseModel
 class LoginResult(BaseModel):
     access_token: str
     expires_in: int
+    refresh_token: str
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
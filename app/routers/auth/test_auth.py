@@ -0,0 +1,138 @@
+from typing import Any
+
+import httpx
+import pytest
+from fastapi import FastAPI, Form, Request
+from fastapi.responses import JSONResponse
+from httpx import AsyncClient
+
+from app.settings import settings
+from app.utilities.breaker import CircuitBreaker
+
+from . import auth
+
+pytestmark = pytest.mark.asyncio
+
+# Stands in for identitytoolkit and securetoken.
+fake_google = FastAPI()
+USERS = {"dog@example.com": "woof"}
+REFRESH_TOKENS = {"refresh-1": "dog@example.com"}
+# Set to make the fake fail like an outage.
+fake_google.state.down = False
+
+
+@fake_google.post("/v1/accounts:signInWithPassword")
+async def sign_in(request: Request, key: str) -> Any:
+    if fake_google.state.down:
+        return JSONResponse({"error": {"message": "UNAVAILABLE"}}, 503)
+
+    data = await request.json()
+    if key != settings.google_auth_sign_in_key:
+        return JSONResponse({"error": {"message": "API_KEY_INVALID"}}, 400)
+    if USERS.get(data["email"]) != data["password"]:
+        return JSONResponse({"error": {"message": "INVALID_PASSWORD"}}, 400)
+
+    return {"idToken": "id-1", "expiresIn": "3600", "refreshToken": "refresh-1"}
+
+
+@fake_google.post("/v1/token")
+async def token(key: str, grant_type: str = Form(), refresh_token: str = Form()) -> Any:
+    if key != settings.google_auth_sign_in_key or grant_type != "refresh_token":
+        return JSONResponse({"error": {"message": "INVALID_GRANT_TYPE"}}, 400)
+    if refresh_token not in REFRESH_TOKENS:
+        return JSONResponse({"error": {"message": "INVALID_REFRESH_TOKEN"}}, 400)
+
+    return {
+        "id_token": "id-2",
+        "expires_in": "3600",
+        "refresh_token": refresh_token,
+        "token_type": "Bearer",
+    }
+
+
+@pytest.fixture(autouse=True)
+def google(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Send auth calls to the fake Google endpoints
+    """
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_google))
+    monkeypatch.setattr(auth, "get_http_client", lambda: client)
+    monkeypatch.setattr(
+        settings,
+        "google_auth_sign_in_url",
+        "http://google/v1/accounts:signInWithPassword",
+    )
+    monkeypatch.setattr(settings, "google_auth_refresh_url", "http://google/v1/token")
+
+
+async def test_login(test_client: AsyncClient) -> None:
+    """
+    Test logging in with email and password
+    """
+    r = await test_client.get("/v1/auth/login", auth=("dog@example.com", "woof"))
+    assert r.status_code == 200
+    assert r.json() == {
+        "access_token": "id-1",
+        "expires_in": 3600,
+        "refresh_token": "refresh-1",
+    }
+
+    # Wrong password
+    r = await test_client.get("/v1/auth/login", auth=("dog@example.com", "meow"))
+    assert r.status_code == 401
+
+
+async def test_refresh(test_client: AsyncClient) -> None:
+    """
+    Test exchanging a refresh token
+    """
+    r = await test_client.post("/v1/auth/refresh", json={"refresh_token": "refresh-1"})
+    assert r.status_code == 200
+    assert r.json() == {
+        "access_token": "id-2",
+        "expires_in": 3600,
+        "refresh_token": "refresh-1",
+    }
+
+    # Unknown refresh token
+    r = await test_client.post("/v1/auth/refresh", json={"refresh_token": "bad"})
+    assert r.status_code == 401
+
+
+async def test_login_circuit(
+    test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Test failing fast while identitytoolkit is down
+    """
+    breaker = CircuitBreaker("test_identitytoolkit", failure_threshold=2)
+    monkeypatch.setattr(auth, "identitytoolkit_breaker", breaker)
+    monkeypatch.setattr(fake_google.state, "down", True)
+
+    for _ in range(2):
+        r = await test_client.get("/v1/auth/login", auth=("dog@example.com", "woof"))
+        assert r.status_code == 503
+    assert breaker.state == "open"
+
+    r = await test_client.get("/v1/auth/login", auth=("dog@example.com", "woof"))
+    assert r.status_code == 503
+
+
+async def test_login_unreachable(
+    test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Test identitytoolkit being unreachable is not taken as bad credentials
+    """
+
+    def refuse(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("connection refused", request=request)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(refuse))
+    monkeypatch.setattr(auth, "get_http_client", lambda: client)
+    breaker = CircuitBreaker("test_identitytoolkit", failure_threshold=2)
+    monkeypatch.setattr(auth, "identitytoolkit_breaker", breaker)
+
+    r = await test_client.get("/v1/auth/login", auth=("dog@example.com", "woof"))
+    assert r.status_code == 503
+    assert breaker.failures == 1
@@ -1,5 +1,5 @@
-from datetime import datetime, timezone
-from typing import Annotated
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Any
 
 import bson
 from bson import ObjectId
@@ -7,8 +7,11 @@ from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
+    Response,
     status,
 )
+from fastapi.responses import JSONResponse
 from fastapi.security import (
     HTTPAuthorizationCredentials,
     HTTPBearer,
@@ -16,12 +19,45 @@ from fastapi.security import (
 
 from app.auth import validate_access
 from app.models import GenericException
-from app.utilities.clients import db
+from app.rate_limit import rate_limit_user
+from app.settings import settings
+from app.utilities.archive import (
+    archive_cutoff,
+    as_utc,
+    changed_at,
+    find_archived_changes,
+    find_archived_logs,
+    find_archived_logs_by_ids,
+    restore_archived_log,
+)
+from app.utilities.batching import InsertBatcher
+from app.utilities.clients import get_db
+from app.utilities.data import (
+    SHARED_READ_CONTEXT,
+    causal_session,
+    causal_time,
+    get_read_collection,
+    get_write_collection,
+    mongo_circuit,
+)
+from app.utilities.deadline import DeadlineRoute
+from app.utilities.fields import (
+    dump_fields,
+    json_response,
+    parse_fields,
+    to_projection,
+)
+from app.utilities.ids import parse_object_ids
+from app.utilities.indexes import LOG_TEXT_WEIGHTS
+from app.utilities.search import text_search
+from app.utilities.singleflight import SingleFlight
 
 from .models import (
     Log,
+    LogChanges,
     LogCreate,
     LogCreatResult,
+    LogSearchResults,
     LogSuccessResult,
     LogUpdate,
 )
@@ -29,46 +65,375 @@ from .models import (
 router = APIRouter(
     prefix="/v1/logs",
     tags=["logs"],
+    dependencies=[Depends(rate_limit_user), Depends(mongo_circuit)],
+    route_class=DeadlineRoute,
     responses={
         status.HTTP_401_UNAUTHORIZED: {
             "description": "Unauthorized",
             "model": GenericException,
-        }
+        },
+        status.HTTP_429_TOO_MANY_REQUESTS: {
+            "description": "Too many requests.",
+            "model": GenericException,
+        },
+        status.HTTP_503_SERVICE_UNAVAILABLE: {
+            "description": "Service unavailable.",
+            "model": GenericException,
+        },
+        status.HTTP_504_GATEWAY_TIMEOUT: {
+            "description": "Deadline exceeded.",
+            "model": GenericException,
+        },
     },
 )
 
 security = HTTPBearer()
 
+reads = SingleFlight("logs", carry=SHARED_READ_CONTEXT)
+
+log_inserts = InsertBatcher(
+    lambda: get_write_collection("logs", "add_log"),
+    max_size=settings.log_insert_batch_size,
+    max_delay_ms=settings.log_insert_batch_window_ms,
+    session=lambda docs: causal_session(*{doc["user_id"] for doc in docs}),
+)
 
-@router.get("", response_model=list[Log])
+
+def to_log(doc: dict[str, Any]) -> Log:
+    """
+    Convert a log document into a Log.
+    """
+    updated_at = doc.get("updated_at")
+    if updated_at:
+        updated_at = updated_at.isoformat()
+
+    return Log(
+        id=str(doc["_id"]),
+        user_id=doc["user_id"],
+        name=doc["name"],
+        type=doc["type"],
+        date=doc["date"].isoformat(),
+        note=doc.get("note"),
+        updated_at=updated_at,
+        created_at=doc["created_at"].isoformat(),
+    )
+
+
+@router.get(
+    "",
+    response_model=list[Log],
+    responses={
+        status.HTTP_400_BAD_REQUEST: {
+            "description": "Invalid log id format.",
+            "model": GenericException,
+        },
+    },
+)
 async def get_logs(
+    response: Response,
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
     user_id: Annotated[None | str, Depends(validate_access)],
-) -> list[Log]:
+    fields: None | str = None,
+    ids: None | str = None,
+    start: None | datetime = None,
+    end: None | datetime = None,
+) -> list[Log] | JSONResponse:
     """
     Get potty logs for dogs.
+
+    Pass `fields`, like `name,type,date`, to only return those fields.
+
+    Pass `ids`, like `a,b,c`, to get those logs in that order. Logs that
+    are not found are returned as `{"id": ..., "detail": "Log not found."}`.
+
+    Pass `start` and/or `end` to get the user's logs dated in that range,
+    oldest first. The user's own archived logs are included either way.
     """
+    field_names = parse_fields(fields, Log)
+    projection = to_projection(field_names)
+
+    if ids is not None:
+        return await get_logs_by_ids(
+            parse_object_ids(ids, "log"), user_id, field_names, projection, response
+        )
+
+    if start or end:
+        return await get_logs_in_range(user_id, start, end, field_names, response)
+
+    async def find_logs() -> list[dict[str, Any]]:
+        async with causal_session(user_id) as session:
+            docs: list[dict[str, Any]] = (
+                await get_read_collection("logs")
+                .find(projection=projection, session=session)
+                .to_list(None)
+            )
+
+        hot_ids = {doc["_id"] for doc in docs}
+        for doc in await find_archived_logs(user_id, None, None):
+            if doc["_id"] not in hot_ids:
+                docs.append(doc)
+
+        return docs
+
+    docs = await reads.do(
+        ("get_logs", user_id, causal_time(user_id), tuple(field_names or ())), find_logs
+    )
+    if field_names:
+        return json_response([dump_fields(doc, field_names) for doc in docs], response)
+
     results = []
-    async for doc in db.logs.find():
-
-        updated_at = doc.get("updated_at")
-        if updated_at:
-            updated_at = updated_at.isoformat()
-
-        results.append(
-            Log(
-                id=str(doc.get("_id")),
-                user_id=doc.get("user_id"),
-                name=doc.get("name"),
-                type=doc.get("type"),
-                date=doc.get("date").isoformat(),
-                note=doc.get("note"),
-                updated_at=updated_at,
-                created_at=doc.get("created_at").isoformat(),
+    for doc in docs:
+        results.append(to_log(doc))
+
+    return results
+
+
+async def get_logs_in_range(
+    user_id: str | None,
+    start: datetime | None,
+    end: datetime | None,
+    field_names: list[str] | None,
+    response: Response,
+) -> list[Log] | JSONResponse:
+    """
+    Get the user's logs dated from `start` up to `end`, reading archived
+    logs too when the range reaches back past the archive cutoff.
+    """
+    dates: dict[str, datetime] = {}
+    if start:
+        dates["$gte"] = start
+    if end:
+        dates["$lt"] = end
+
+    async with causal_session(user_id) as session:
+        docs: list[dict[str, Any]] = (
+            await get_read_collection("logs")
+            .find(
+                {"user_id": user_id, "date": dates},
+                to_projection(field_names, "date"),
+                session=session,
             )
+            .to_list(None)
         )
 
-    return results
+    if start is None or as_utc(start) < archive_cutoff():
+        hot_ids = {doc["_id"] for doc in docs}
+        for doc in await find_archived_logs(user_id, start, end):
+            if doc["_id"] not in hot_ids:
+                docs.append(doc)
+
+    docs.sort(key=lambda doc: (doc["date"], doc["_id"]))
+    if field_names:
+        return json_response([dump_fields(doc, field_names) for doc in docs], response)
+
+    return [to_log(doc) for doc in docs]
+
+
+async def get_logs_by_ids(
+    object_ids: list[ObjectId],
+    user_id: str | None,
+    field_names: list[str] | None,
+    projection: dict[str, int] | None,
+    response: Response,
+) -> JSONResponse:
+    """
+    Get the user's logs with `object_ids` in one query, in the requested order.
+    """
+
+    async def find_logs() -> list[dict[str, Any]]:
+        docs: list[dict[str, Any]] = (
+            await get_db()
+            .logs.find({"_id": {"$in": object_ids}, "user_id": user_id}, projection)
+            .to_list(None)
+        )
+        found = {doc["_id"] for doc in docs}
+        missing = [object_id for object_id in object_ids if object_id not in found]
+        if missing:
+            docs += await find_archived_logs_by_ids(missing, user_id)
+
+        return docs
+
+    docs = await reads.do(
+        (
+            "get_logs_by_ids",
+            user_id,
+            causal_time(user_id),
+            tuple(object_ids),
+            tuple(field_names or ()),
+        ),
+        find_logs,
+    )
+    found = {doc["_id"]: doc for doc in docs}
+
+    results = []
+    for object_id in object_ids:
+        doc = found.get(object_id)
+        if doc is None:
+            results.append({"id": str(object_id), "detail": "Log not found."})
+        elif field_names:
+            results.append(dump_fields(doc, field_names))
+        else:
+            results.append(to_log(doc).model_dump(mode="json"))
+
+    return json_response(results, response)
+
+
+@router.get(
+    "/changes",
+    response_model=LogChanges,
+    responses={
+        status.HTTP_400_BAD_REQUEST: {
+            "description": "Invalid sync token.",
+            "model": GenericException,
+        },
+        status.HTTP_410_GONE: {
+            "description": "Sync token expired.",
+            "model": GenericException,
+        },
+    },
+)
+async def get_log_changes(
+    response: Response,
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
+    user_id: Annotated[None | str, Depends(validate_access)],
+    since: None | str = None,
+    fields: None | str = None,
+) -> LogChanges | JSONResponse:
+    """
+    Get potty logs created, updated or deleted since a sync token.
+
+    Omit `since` for a full sync. Pass the returned `token` on the next call
+    to only receive what changed in between. Pass `fields` to only return
+    those fields of each log.
+
+    Archived logs are included like any other.
+
+    Changes stamped up to `settings.changes_lag_ms` before the token are
+    returned again, clients should apply them by id. Deletes are kept for
+    `settings.tombstone_retention_days`, tokens older than that get a 410
+    and need a full sync.
+    """
+    field_names = parse_fields(fields, Log)
+    projection = to_projection(field_names, "updated_at", "created_at")
+
+    query: dict[str, Any] = {"user_id": user_id}
+    tombstone_query: dict[str, Any] = {"user_id": user_id}
+    since_time: datetime | None = None
+    after: datetime | None = None
+    if since:
+        try:
+            since_time = datetime.fromisoformat(since)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token."
+            )
+
+        retention = timedelta(days=settings.tombstone_retention_days)
+        if as_utc(since_time) < as_utc(datetime.now(timezone.utc)) - retention:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE, detail="Sync token expired."
+            )
+
+        # Timestamps come from each worker's clock when the write started,
+        # so look back a little for writes that were committed late.
+        after = since_time - timedelta(milliseconds=settings.changes_lag_ms)
+        # Logs written before updated_at was tracked only have created_at.
+        query["$or"] = [
+            {"updated_at": {"$gt": after}},
+            {"updated_at": None, "created_at": {"$gt": after}},
+        ]
+        tombstone_query["updated_at"] = {"$gt": after}
+
+    latest = as_utc(since_time) if since_time else None
+    docs = []
+    deleted = []
+
+    # Read from the primary, secondaries may not have the latest changes yet.
+    async with causal_session(user_id) as session:
+        async for doc in (
+            get_db().logs.find(query, projection, session=session).sort("updated_at", 1)
+        ):
+            docs.append(doc)
+            latest = max(latest or changed_at(doc), changed_at(doc))
+
+        async for doc in (
+            get_db()
+            .log_tombstones.find(tombstone_query, session=session)
+            .sort("updated_at", 1)
+        ):
+            deleted.append(doc.get("log_id"))
+            latest = max(latest or doc["updated_at"], doc["updated_at"])
+
+    # Logs can be changed right before they are archived.
+    hot_ids = {doc["_id"] for doc in docs}
+    for doc in await find_archived_changes(user_id, after):
+        if doc["_id"] not in hot_ids:
+            docs.append(doc)
+            latest = max(latest or changed_at(doc), changed_at(doc))
+
+    token = latest.isoformat() if latest else None
+
+    if field_names:
+        return json_response(
+            {
+                "logs": [dump_fields(doc, field_names) for doc in docs],
+                "deleted": deleted,
+                "token": token,
+            },
+            response,
+        )
+
+    return LogChanges(logs=[to_log(doc) for doc in docs], deleted=deleted, token=token)
+
+
+@router.get(
+    "/search",
+    response_model=LogSearchResults,
+    responses={
+        status.HTTP_400_BAD_REQUEST: {
+            "description": "Invalid cursor.",
+            "model": GenericException,
+        },
+    },
+)
+async def search_logs(
+    response: Response,
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
+    user_id: Annotated[None | str, Depends(validate_access)],
+    q: Annotated[str, Query(min_length=1)],
+    cursor: None | str = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    fields: None | str = None,
+) -> LogSearchResults | JSONResponse:
+    """
+    Search the names and notes of the user's potty logs, most relevant first.
+
+    Pass the returned `cursor` to get the next page.
+    """
+    field_names = parse_fields(fields, Log)
+
+    async with causal_session(user_id) as session:
+        docs, next_cursor = await text_search(
+            get_read_collection("logs"),
+            {"user_id": user_id},
+            q,
+            LOG_TEXT_WEIGHTS,
+            cursor,
+            limit,
+            projection=to_projection(field_names),
+            session=session,
+        )
+
+    if field_names:
+        return json_response(
+            {
+                "logs": [dump_fields(doc, field_names) for doc in docs],
+                "cursor": next_cursor,
+            },
+            response,
+        )
+
+    return LogSearchResults(logs=[to_log(doc) for doc in docs], cursor=next_cursor)
 
 
 @router.get(
@@ -87,12 +452,19 @@ async def get_logs(
 )
 async def get_log(
     log_id: str,
+    response: Response,
     access_token: Annotated[HTTPAuthorizationCredentials, Depends(security)],
     user_id: Annotated[None | str, Depends(validate_access)],
-) -> Log:
+    fields: None | str = None,
+) -> Log | JSONResponse:
     """
     Get a potty log for a dog.
+
+    Pass `fields`, like `name,type,date`, to only return those fields.
     """
+    field_names = parse_fields(fields, Log)
+    projection = to_projection(field_names)
+
     try:
         log_object_id = ObjectId(log_id)
     except bson.errors.InvalidId:
@@ -100,25 +472,35 @@ async def get_log(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid log id format."
         )
 
-    doc = await db.logs.find_one({"_id": log_object_id})
+    async def find_log() -> dict[str, Any] | None:
+        doc: dict[str, Any] | None = await get_db().logs.find_one(
+            {"_id": log_object_id}, projection
+        )
+        if doc is None:
+            archived = await find_archived_logs_by_ids([log_object_id])
+            doc = archived[0] if archived else None
+
+        return doc
+
+    doc = await reads.do(
+        (
+            "get_log",
+            user_id,
+            causal_time(user_id),
+            log_object_id,
+            tuple(field_names or ()),
+        ),
+        find_log,
+    )
     if not doc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Log not found."
         )
 
-    updated_at = doc.get("updated_at")
-    if updated_at:
-        updated_at = updated_at.isoformat()
-    return Log(
-        id=str(doc.get("_id")),
-        user_id=doc.get("user_id"),
-        name=doc.get("name"),
-        type=doc.get("type"),
-        date=doc.get("date").isoformat(),
-        note=doc.get("note"),
-        updated_at=updated_at,
-        created_at=doc.get("created_at").isoformat(),
-    )
+    if field_names:
+        return json_response(dump_fields(doc, field_names), response)
+
+    return to_log(doc)
 
 
 @router.post(
@@ -132,16 +514,20 @@ async def add_log(
 ) -> LogCreatResult:
     """
     Add a potty log for a dog.
+
+    With batched inserts, a request that runs out of time after its batch
+    started writing still adds the log.
     """
 
+    now = datetime.now(timezone.utc)
     data = (
         new_log.model_dump()
         | {"user_id": user_id}
-        | {"created_at": datetime.now(timezone.utc)}
+        | {"created_at": now, "updated_at": now}
     )
-    create_result = await db.logs.insert_one(data)
+    inserted_id = await log_inserts.insert(data)
 
-    return LogCreatResult(id=str(create_result.inserted_id))
+    return LogCreatResult(id=str(inserted_id))
 
 
 @router.delete(
@@ -164,7 +550,7 @@ async def delete_log(
     user_id: Annotated[None | str, Depends(validate_access)],
 ) -> LogSuccessResult:
     """
-    Delete a potty log for a dog.
+    Delete a potty log for a dog, archived ones included.
     """
 
     try:
@@ -174,11 +560,27 @@ async def delete_log(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid log id format."
         )
 
-    delete_result = await db.logs.delete_one({"_id": log_object_id, "user_id": user_id})
-    if delete_result.deleted_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Log not found",
+    collection = get_write_collection("logs", "delete_log")
+    query = {"_id": log_object_id, "user_id": user_id}
+    async with causal_session(user_id) as session:
+        delete_result = await collection.delete_one(query, session=session)
+        if delete_result.deleted_count == 0 and await restore_archived_log(
+            log_object_id, user_id
+        ):
+            delete_result = await collection.delete_one(query, session=session)
+        if delete_result.deleted_count == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Log not found",
+            )
+
+        await get_write_collection("log_tombstones", "delete_log").insert_one(
+            {
+                "log_id": log_id,
+                "user_id": user_id,
+                "updated_at": datetime.now(timezone.utc),
+            },
+            session=session,
         )
 
     return LogSuccessResult(success=True)
@@ -205,7 +607,7 @@ async def update_log(
     user_id: Annotated[None | str, Depends(validate_access)],
 ) -> LogSuccessResult:
     """
-    Update a potty log for a dog.
+    Update a potty log for a dog. Archived logs are restored first.
     """
 
     try:
@@ -218,9 +620,18 @@ async def update_log(
     update_data = log_update.model_dump(exclude_unset=True) | {
         "updated_at": datetime.now(timezone.utc)
     }
-    update_result = await db.logs.update_one(
-        {"_id": log_object_id, "user_id": user_id}, {"$set": update_data}
-    )
+    collection = get_write_collection("logs", "update_log")
+    query = {"_id": log_object_id, "user_id": user_id}
+    async with causal_session(user_id) as session:
+        update_result = await collection.update_one(
+            query, {"$set": update_data}, session=session
+        )
+        if update_result.matched_count == 0 and await restore_archived_log(
+            log_object_id, user_id
+        ):
+            update_result = await collection.update_one(
+                query, {"$set": update_data}, session=session
+            )
 
     if update_result.matched_count == 0:
         raise HTTPException(
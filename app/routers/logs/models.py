@@ -15,6 +15,17 @@ class Log(BaseModel):
     updated_at: Optional[datetime] = None
 
 
+class LogChanges(BaseModel):
+    logs: list[Log]
+    deleted: list[str]
+    token: Optional[str] = None
+
+
+class LogSearchResults(BaseModel):
+    logs: list[Log]
+    cursor: Optional[str] = None
+
+
 class LogCreate(BaseModel):
     name: str
     type: str
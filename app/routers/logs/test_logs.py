@@ -1,7 +1,10 @@
+from datetime import datetime, timedelta, timezone
+
 import pytest
 from httpx import AsyncClient
 
 from app.settings import settings
+from app.utilities.clients import get_db
 
 pytestmark = pytest.mark.asyncio
 AUTH_HEADER = {"Authorization": f"Bearer {settings.static_token}"}
@@ -45,6 +48,7 @@ async def test_get_logs(test_client: AsyncClient) -> None:
     # Get all Logs
     r = await test_client.get("/v1/logs", headers=AUTH_HEADER)
     assert r.status_code == 200
+    assert r.headers.get("RateLimit-Remaining")
     results = r.json()
     assert results
 
@@ -62,6 +66,54 @@ async def test_get_logs(test_client: AsyncClient) -> None:
     r = await test_client.get("/v1/logs/invalid", headers=AUTH_HEADER)
     assert r.status_code == 400
 
+    # Only some fields
+    r = await test_client.get(
+        "/v1/logs", params={"fields": "name,type,date"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    assert r.headers.get("RateLimit-Remaining")
+    assert set(r.json()[0]) == {"id", "name", "type", "date"}
+
+    r = await test_client.get(
+        f"/v1/logs/{log_id}", params={"fields": "note"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    assert r.headers.get("RateLimit-Remaining")
+    assert r.json() == {"id": log_id, "note": results[0].get("note")}
+
+    # Unknown fields
+    r = await test_client.get(
+        "/v1/logs", params={"fields": "name,color"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 400
+
+    # Batch by ids, in the requested order with not found markers
+    missing_id = "652d729bb8da04810695a943"
+    r = await test_client.get(
+        "/v1/logs", params={"ids": f"{missing_id},{log_id}"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    assert r.headers.get("RateLimit-Remaining")
+    assert r.json() == [
+        {"id": missing_id, "detail": "Log not found."},
+        results[0],
+    ]
+
+    r = await test_client.get(
+        "/v1/logs",
+        params={"ids": log_id, "fields": "name"},
+        headers=AUTH_HEADER,
+    )
+    assert r.status_code == 200
+    assert r.json() == [{"id": log_id, "name": results[0].get("name")}]
+
+    # Invalid ids are reported together
+    r = await test_client.get(
+        "/v1/logs", params={"ids": f"bad,{log_id},worse"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Invalid log id format: bad, worse."
+
 
 async def test_update_logs(test_client: AsyncClient) -> None:
     """
@@ -145,3 +197,215 @@ async def test_delete_log(test_client: AsyncClient) -> None:
         headers=AUTH_HEADER,
     )
     assert r.status_code == 400
+
+
+async def test_log_changes(
+    test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Test syncing log changes
+    """
+    monkeypatch.setattr(settings, "changes_lag_ms", 0)
+    r = await test_client.post(
+        "/v1/logs",
+        json={"name": "string", "type": "string", "date": "2024-10-30T13:52:23.666Z"},
+        headers=AUTH_HEADER,
+    )
+    assert r.status_code == 200
+
+    # Full Sync
+    r = await test_client.get("/v1/logs/changes", headers=AUTH_HEADER)
+    assert r.status_code == 200
+    results = r.json()
+    assert results.get("logs")
+    token = results.get("token")
+    assert token
+
+    # Full Sync with only some fields
+    r = await test_client.get(
+        "/v1/logs/changes", params={"fields": "name"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    assert r.headers.get("RateLimit-Remaining")
+    assert set(r.json().get("logs")[0]) == {"id", "name"}
+    assert r.json().get("token") == token
+
+    # No changes since token
+    r = await test_client.get(
+        "/v1/logs/changes", params={"since": token}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    results = r.json()
+    assert results.get("logs") == []
+    assert results.get("deleted") == []
+    assert results.get("token") == token
+
+    # Created and deleted since token
+    r = await test_client.post(
+        "/v1/logs",
+        json={"name": "string", "type": "string", "date": "2024-10-30T13:52:23.666Z"},
+        headers=AUTH_HEADER,
+    )
+    assert r.status_code == 200
+    created_id = r.json().get("id")
+
+    r = await test_client.get(
+        "/v1/logs/changes", params={"since": token}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    results = r.json()
+    assert [log.get("id") for log in results.get("logs")] == [created_id]
+    token = results.get("token")
+
+    r = await test_client.delete(f"/v1/logs/{created_id}", headers=AUTH_HEADER)
+    assert r.status_code == 200
+
+    r = await test_client.get(
+        "/v1/logs/changes", params={"since": token}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    results = r.json()
+    assert results.get("logs") == []
+    assert results.get("deleted") == [created_id]
+
+    # Invalid token
+    r = await test_client.get(
+        "/v1/logs/changes", params={"since": "invalid"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 400
+
+    # Token older than the tombstone retention
+    r = await test_client.get(
+        "/v1/logs/changes",
+        params={"since": "2000-01-01T00:00:00"},
+        headers=AUTH_HEADER,
+    )
+    assert r.status_code == 410
+
+
+async def test_log_changes_legacy(
+    test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Test syncing logs written before updated_at was tracked
+    """
+    monkeypatch.setattr(settings, "changes_lag_ms", 0)
+    legacy = {
+        "user_id": "tester",
+        "name": "legacy",
+        "type": "string",
+        "date": datetime(2024, 10, 30),
+        "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+    await get_db().logs.insert_one(dict(legacy))
+
+    # Full Sync
+    r = await test_client.get("/v1/logs/changes", headers=AUTH_HEADER)
+    assert r.status_code == 200
+    results = r.json()
+    assert "legacy" in [log.get("name") for log in results.get("logs")]
+    token = results.get("token")
+
+    # Created since token
+    created_at = datetime.fromisoformat(token) + timedelta(seconds=1)
+    legacy["created_at"] = created_at
+    result = await get_db().logs.insert_one(legacy)
+
+    r = await test_client.get(
+        "/v1/logs/changes", params={"since": token}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    results = r.json()
+    assert [log.get("id") for log in results.get("logs")] == [str(result.inserted_id)]
+    assert results.get("token") == created_at.isoformat()
+
+
+async def test_log_changes_late_writes(test_client: AsyncClient) -> None:
+    """
+    Test writes committed after a token, but stamped before it, are synced
+    """
+    r = await test_client.post(
+        "/v1/logs",
+        json={"name": "string", "type": "string", "date": "2024-10-30T13:52:23.666Z"},
+        headers=AUTH_HEADER,
+    )
+    assert r.status_code == 200
+
+    r = await test_client.get("/v1/logs/changes", headers=AUTH_HEADER)
+    assert r.status_code == 200
+    token = r.json().get("token")
+
+    # Stamped by a worker whose clock is a second behind
+    stamped_at = datetime.fromisoformat(token) - timedelta(seconds=1)
+    result = await get_db().logs.insert_one(
+        {"user_id": "tester", "name": "late", "type": "string"}
+        | {"date": stamped_at, "created_at": stamped_at, "updated_at": stamped_at}
+    )
+
+    r = await test_client.get(
+        "/v1/logs/changes", params={"since": token}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    results = r.json()
+    assert str(result.inserted_id) in [log.get("id") for log in results.get("logs")]
+    assert results.get("token") == token
+
+
+async def test_search_logs(test_client: AsyncClient) -> None:
+    """
+    Test searching logs
+    """
+    log_ids = []
+    for name, note in [
+        ("sock", "Ate a sock in the park"),
+        ("walk", "Long walk, found a sock"),
+        ("walk", "Nothing to report"),
+    ]:
+        r = await test_client.post(
+            "/v1/logs",
+            json={"name": name, "type": "poop", "date": "2024-10-30T13:52:23.666Z"},
+            headers=AUTH_HEADER,
+        )
+        assert r.status_code == 200
+        log_ids.append(r.json().get("id"))
+
+        r = await test_client.patch(
+            f"/v1/logs/{log_ids[-1]}", json={"note": note}, headers=AUTH_HEADER
+        )
+        assert r.status_code == 200
+
+    # Name matches rank above note matches
+    r = await test_client.get(
+        "/v1/logs/search", params={"q": "Sock", "limit": 1}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    results = r.json()
+    assert [log.get("id") for log in results.get("logs")] == [log_ids[0]]
+    assert results.get("cursor")
+
+    r = await test_client.get(
+        "/v1/logs/search",
+        params={"q": "Sock", "limit": 1, "cursor": results.get("cursor")},
+        headers=AUTH_HEADER,
+    )
+    assert r.status_code == 200
+    results = r.json()
+    assert [log.get("id") for log in results.get("logs")] == [log_ids[1]]
+    assert results.get("cursor") is None
+
+    # Only some fields
+    r = await test_client.get(
+        "/v1/logs/search", params={"q": "report", "fields": "note"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    assert r.headers.get("RateLimit-Remaining")
+    assert r.json() == {
+        "logs": [{"id": log_ids[2], "note": "Nothing to report"}],
+        "cursor": None,
+    }
+
+    # Invalid cursor
+    r = await test_client.get(
+        "/v1/logs/search", params={"q": "sock", "cursor": "bad"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 400
@@ -0,0 +1,51 @@
+from typing import Annotated, Any
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    status,
+)
+from fastapi.security import (
+    HTTPAuthorizationCredentials,
+    HTTPBearer,
+)
+
+from app.auth import validate_access
+from app.models import GenericException
+from app.rate_limit import rate_limit_user
+from app.utilities import metrics
+from app.utilities.deadline import DeadlineRoute
+
+router = APIRouter(
+    prefix="/v1/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(rate_limit_user)],
+    route_class=DeadlineRoute,
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {
+            "description": "Unauthorized",
+            "model": GenericException,
+        },
+        status.HTTP_429_TOO_MANY_REQUESTS: {
+            "description": "Too many requests.",
+            "model": GenericException,
+        },
+        status.HTTP_504_GATEWAY_TIMEOUT: {
+            "description": "Deadline exceeded.",
+            "model": GenericException,
+        },
+    },
+)
+
+security = HTTPBearer()
+
+
+@router.get("", response_model=dict[str, dict[str, Any]])
+async def get_metrics(
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
+    user_id: Annotated[None | str, Depends(validate_access)],
+) -> dict[str, dict[str, Any]]:
+    """
+    Get process metrics.
+    """
+    return metrics.collect()
@@ -0,0 +1,24 @@
+import pytest
+from httpx import AsyncClient
+
+from app.settings import settings
+
+pytestmark = pytest.mark.asyncio
+AUTH_HEADER = {"Authorization": f"Bearer {settings.static_token}"}
+
+
+async def test_get_metrics(test_client: AsyncClient) -> None:
+    """
+    Test Fetching metrics
+    """
+    # No Bearer Token
+    r = await test_client.get("/v1/metrics")
+    assert r.status_code == 403
+
+    # Get Metrics
+    r = await test_client.get("/v1/metrics", headers=AUTH_HEADER)
+    assert r.status_code == 200
+
+    results = r.json()
+    assert results.get("singleflight.logs").get("calls") is not None
+    assert results.get("singleflight.pets").get("calls") is not None
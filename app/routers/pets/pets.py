@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from typing import Annotated
+from typing import Annotated, Any
 
 import bson
 from bson import ObjectId
@@ -7,8 +7,10 @@ from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Response,
     status,
 )
+from fastapi.responses import JSONResponse
 from fastapi.security import (
     HTTPAuthorizationCredentials,
     HTTPBearer,
@@ -16,7 +18,25 @@ from fastapi.security import (
 
 from app.auth import validate_access
 from app.models import GenericException
-from app.utilities.clients import db
+from app.rate_limit import rate_limit_user
+from app.utilities.clients import get_db
+from app.utilities.data import (
+    SHARED_READ_CONTEXT,
+    causal_session,
+    causal_time,
+    get_read_collection,
+    get_write_collection,
+    mongo_circuit,
+)
+from app.utilities.deadline import DeadlineRoute
+from app.utilities.fields import (
+    dump_fields,
+    json_response,
+    parse_fields,
+    to_projection,
+)
+from app.utilities.ids import parse_object_ids
+from app.utilities.singleflight import SingleFlight
 
 from .models import (
     Pet,
@@ -29,46 +49,150 @@ from .models import (
 router = APIRouter(
     prefix="/v1/pets",
     tags=["pets"],
+    dependencies=[Depends(rate_limit_user), Depends(mongo_circuit)],
+    route_class=DeadlineRoute,
     responses={
         status.HTTP_401_UNAUTHORIZED: {
             "description": "Unauthorized",
             "model": GenericException,
-        }
+        },
+        status.HTTP_429_TOO_MANY_REQUESTS: {
+            "description": "Too many requests.",
+            "model": GenericException,
+        },
+        status.HTTP_503_SERVICE_UNAVAILABLE: {
+            "description": "Service unavailable.",
+            "model": GenericException,
+        },
+        status.HTTP_504_GATEWAY_TIMEOUT: {
+            "description": "Deadline exceeded.",
+            "model": GenericException,
+        },
     },
 )
 
 security = HTTPBearer()
 
+reads = SingleFlight("pets", carry=SHARED_READ_CONTEXT)
 
-@router.get("", response_model=list[Pet])
+
+def to_pet(doc: dict[str, Any]) -> Pet:
+    """
+    Convert a pet document into a Pet.
+    """
+    updated_at = doc.get("updated_at")
+    if updated_at:
+        updated_at = updated_at.isoformat()
+
+    return Pet(
+        id=str(doc["_id"]),
+        user_id=doc["user_id"],
+        name=doc["name"],
+        type=doc["type"],
+        updated_at=updated_at,
+        created_at=doc["created_at"].isoformat(),
+    )
+
+
+@router.get(
+    "",
+    response_model=list[Pet],
+    responses={
+        status.HTTP_400_BAD_REQUEST: {
+            "description": "Invalid pet id format.",
+            "model": GenericException,
+        },
+    },
+)
 async def get_pets(
+    response: Response,
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
     user_id: Annotated[None | str, Depends(validate_access)],
-) -> list[Pet]:
+    fields: None | str = None,
+    ids: None | str = None,
+) -> list[Pet] | JSONResponse:
     """
     Get pets data.
+
+    Pass `fields`, like `name,type`, to only return those fields.
+
+    Pass `ids`, like `a,b,c`, to get those pets in that order. Pets that
+    are not found are returned as `{"id": ..., "detail": "Pet not found."}`.
     """
-    results = []
-    async for doc in db.pets.find():
-
-        updated_at = doc.get("updated_at")
-        if updated_at:
-            updated_at = updated_at.isoformat()
-
-        results.append(
-            Pet(
-                id=str(doc.get("_id")),
-                user_id=doc.get("user_id"),
-                name=doc.get("name"),
-                type=doc.get("type"),
-                updated_at=updated_at,
-                created_at=doc.get("created_at").isoformat(),
-            )
+    field_names = parse_fields(fields, Pet)
+    projection = to_projection(field_names)
+
+    if ids is not None:
+        return await get_pets_by_ids(
+            parse_object_ids(ids, "pet"), user_id, field_names, projection, response
         )
 
+    async def find_pets() -> list[dict[str, Any]]:
+        async with causal_session(user_id) as session:
+            docs: list[dict[str, Any]] = (
+                await get_read_collection("pets")
+                .find(projection=projection, session=session)
+                .to_list(None)
+            )
+            return docs
+
+    docs = await reads.do(
+        ("get_pets", user_id, causal_time(user_id), tuple(field_names or ())), find_pets
+    )
+    if field_names:
+        return json_response([dump_fields(doc, field_names) for doc in docs], response)
+
+    results = []
+    for doc in docs:
+        results.append(to_pet(doc))
+
     return results
 
 
+async def get_pets_by_ids(
+    object_ids: list[ObjectId],
+    user_id: str | None,
+    field_names: list[str] | None,
+    projection: dict[str, int] | None,
+    response: Response,
+) -> JSONResponse:
+    """
+    Get the user's pets with `object_ids` in one query, in the requested order.
+    """
+
+    async def find_pets() -> list[dict[str, Any]]:
+        docs: list[dict[str, Any]] = (
+            await get_db()
+            .pets.find({"_id": {"$in": object_ids}, "user_id": user_id}, projection)
+            .to_list(None)
+        )
+        return docs
+
+    docs = await reads.do(
+        (
+            "get_pets_by_ids",
+            user_id,
+            causal_time(user_id),
+            tuple(object_ids),
+            tuple(field_names or ()),
+        ),
+        find_pets,
+    )
+    found = {doc["_id"]: doc for doc in docs}
+
+    results = []
+    for object_id in object_ids:
+        doc = found.get(object_id)
+        if doc is None:
+            results.append({"id": str(object_id), "detail": "Pet not found."})
+        elif field_names:
+            results.append(dump_fields(doc, field_names))
+        else:
+            results.append(to_pet(doc).model_dump(mode="json"))
+
+    return json_response(results, response)
+
+
 @router.get(
     "/{pet_id}",
     response_model=Pet,
@@ -85,12 +209,19 @@ async def get_pets(
 )
 async def get_pet(
     pet_id: str,
+    response: Response,
     access_token: Annotated[HTTPAuthorizationCredentials, Depends(security)],
     user_id: Annotated[None | str, Depends(validate_access)],
-) -> Pet:
+    fields: None | str = None,
+) -> Pet | JSONResponse:
     """
     Get one pets data
+
+    Pass `fields`, like `name,type`, to only return those fields.
     """
+    field_names = parse_fields(fields, Pet)
+    projection = to_projection(field_names)
+
     try:
         pet_object_id = ObjectId(pet_id)
     except bson.errors.InvalidId:
@@ -98,24 +229,25 @@ async def get_pet(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pet id format."
         )
 
-    doc = await db.pets.find_one({"_id": pet_object_id})
+    doc = await reads.do(
+        (
+            "get_pet",
+            user_id,
+            causal_time(user_id),
+            pet_object_id,
+            tuple(field_names or ()),
+        ),
+        lambda: get_db().pets.find_one({"_id": pet_object_id}, projection),
+    )
     if not doc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Pet not found."
         )
 
-    updated_at = doc.get("updated_at")
-    if updated_at:
-        updated_at = updated_at.isoformat()
+    if field_names:
+        return json_response(dump_fields(doc, field_names), response)
 
-    return Pet(
-        id=str(doc.get("_id")),
-        user_id=doc.get("user_id"),
-        name=doc.get("name"),
-        type=doc.get("type"),
-        updated_at=updated_at,
-        created_at=doc.get("created_at").isoformat(),
-    )
+    return to_pet(doc)
 
 
 @router.post(
@@ -136,7 +268,10 @@ async def add_pet(
         | {"user_id": user_id}
         | {"created_at": datetime.now(timezone.utc)}
     )
-    create_result = await db.pets.insert_one(data)
+    async with causal_session(user_id) as session:
+        create_result = await get_write_collection("pets", "add_pet").insert_one(
+            data, session=session
+        )
 
     return PetCreatResult(id=str(create_result.inserted_id))
 
@@ -170,7 +305,10 @@ async def delete_pet(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pet id format."
         )
 
-    delete_result = await db.pets.delete_one({"_id": pet_object_id, "user_id": user_id})
+    async with causal_session(user_id) as session:
+        delete_result = await get_write_collection("pets", "delete_pet").delete_one(
+            {"_id": pet_object_id, "user_id": user_id}, session=session
+        )
     if delete_result.deleted_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -214,9 +352,12 @@ async def update_pet(
     update_data = pet_update.model_dump(exclude_unset=True) | {
         "updated_at": datetime.now(timezone.utc)
     }
-    update_result = await db.pets.update_one(
-        {"_id": pet_object_id, "user_id": user_id}, {"$set": update_data}
-    )
+    async with causal_session(user_id) as session:
+        update_result = await get_write_collection("pets", "update_pet").update_one(
+            {"_id": pet_object_id, "user_id": user_id},
+            {"$set": update_data},
+            session=session,
+        )
 
     if update_result.matched_count == 0:
         raise HTTPException(
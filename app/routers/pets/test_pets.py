@@ -62,6 +62,54 @@ async def test_get_pets(test_client: AsyncClient) -> None:
     r = await test_client.get("/v1/pets/invalid", headers=AUTH_HEADER)
     assert r.status_code == 400
 
+    # Only some fields
+    r = await test_client.get(
+        "/v1/pets", params={"fields": "name"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    assert r.headers.get("RateLimit-Remaining")
+    assert set(r.json()[0]) == {"id", "name"}
+
+    r = await test_client.get(
+        f"/v1/pets/{pet_id}", params={"fields": "name,type"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    assert r.headers.get("RateLimit-Remaining")
+    assert set(r.json()) == {"id", "name", "type"}
+
+    # Unknown fields
+    r = await test_client.get(
+        f"/v1/pets/{pet_id}", params={"fields": "color"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 400
+
+    # Batch by ids, in the requested order with not found markers
+    missing_id = "652d729bb8da04810695a943"
+    r = await test_client.get(
+        "/v1/pets", params={"ids": f"{missing_id},{pet_id}"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    assert r.headers.get("RateLimit-Remaining")
+    assert r.json() == [
+        {"id": missing_id, "detail": "Pet not found."},
+        results[0],
+    ]
+
+    r = await test_client.get(
+        "/v1/pets",
+        params={"ids": pet_id, "fields": "name"},
+        headers=AUTH_HEADER,
+    )
+    assert r.status_code == 200
+    assert r.json() == [{"id": pet_id, "name": results[0].get("name")}]
+
+    # Invalid ids are reported together
+    r = await test_client.get(
+        "/v1/pets", params={"ids": f"bad,{pet_id},worse"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Invalid pet id format: bad, worse."
+
 
 async def test_update_pets(test_client: AsyncClient) -> None:
     """
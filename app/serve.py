@@ -0,0 +1,88 @@
+"""
+Production server launcher.
+
+    $ python -m app.serve
+"""
+
+import importlib.util
+import math
+import os
+from pathlib import Path
+
+import uvicorn
+from uvicorn.config import HTTPProtocolType, LoopSetupType
+
+from app.settings import settings
+
+from .utilities.log import logger
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def cpu_quota(root: Path = CGROUP_ROOT) -> float | None:
+    """
+    Get the container CPU limit in cores from the cgroup, if there is one.
+    """
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    cpu_max = root / "cpu.max"
+    if cpu_max.is_file():
+        quota, _, period = cpu_max.read_text().strip().partition(" ")
+        if quota == "max":
+            return None
+        return int(quota) / int(period or 100000)
+
+    # cgroup v1: quota is -1 when unlimited
+    quota_file = root / "cpu" / "cpu.cfs_quota_us"
+    period_file = root / "cpu" / "cpu.cfs_period_us"
+    if quota_file.is_file() and period_file.is_file():
+        quota_us = int(quota_file.read_text())
+        if quota_us <= 0:
+            return None
+        return quota_us / int(period_file.read_text())
+
+    return None
+
+
+def worker_count(root: Path = CGROUP_ROOT) -> int:
+    """
+    One worker per core the container may use, at least one.
+    """
+    cpus = float(len(os.sched_getaffinity(0)))
+    quota = cpu_quota(root)
+    if quota is not None:
+        cpus = min(cpus, quota)
+
+    return max(1, math.ceil(cpus))
+
+
+def has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def main() -> None:
+    workers = settings.server_workers or worker_count()
+    loop: LoopSetupType = "uvloop" if has_module("uvloop") else "asyncio"
+    http: HTTPProtocolType = "httptools" if has_module("httptools") else "h11"
+
+    logger.info("Starting %s workers with loop=%s http=%s", workers, loop, http)
+
+    uvicorn.run(
+        "app.main:app",
+        host=settings.server_host,
+        port=settings.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keep_alive,
+        timeout_graceful_shutdown=settings.server_graceful_shutdown,
+        # Recycled workers are only replaced by the multi-worker supervisor,
+        # a lone worker hitting the limit would stop the server.
+        limit_max_requests=settings.server_max_requests if workers > 1 else None,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.server_forwarded_allow_ips,
+    )
+
+
+if __name__ == "__main__":
+    main()
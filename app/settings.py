@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -12,8 +14,93 @@ class Settings(BaseSettings):
         "https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword"
     )
     google_auth_sign_in_key: str
+    google_auth_refresh_url: str = "https://securetoken.googleapis.com/v1/token"
     testing: bool = False
 
+    # List reads go to the primary unless READ_PREFERENCE sends them to
+    # secondaries. Reading your own writes from a secondary only holds within
+    # the worker that made them, so only do that with a single worker.
+    # Write concerns are set per endpoint name, like
+    # WRITE_CONCERNS='{"add_log": 1}', falling back to WRITE_CONCERN.
+    read_preference: Literal[
+        "primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"
+    ] = "primary"
+    read_max_staleness: int = 90
+    write_concern: int | str | None = None
+    write_concerns: dict[str, int | str] = {}
+
+    # Group-commit log inserts, disabled when the batch size is 1.
+    log_insert_batch_size: int = 1
+    log_insert_batch_window_ms: float = 5
+
+    # Responses smaller than this are not worth compressing.
+    compression_minimum_size: int = 500
+    compression_cache_size: int = 256
+    compression_cache_bytes: int = 16 * 1024 * 1024
+
+    # Adaptive cap on in-flight requests per process. Responses are slow
+    # past the target latency and the tolerance times their route's usual
+    # latency.
+    concurrency_initial_limit: int = 20
+    concurrency_min_limit: int = 2
+    concurrency_max_limit: int = 200
+    concurrency_target_latency_ms: float = 250
+    concurrency_reserve: float = 0.2
+    concurrency_latency_tolerance: float = 2.0
+
+    # Token bucket rate limits, tokens per second and bucket size.
+    rate_limit_read_rate: float = 10
+    rate_limit_read_burst: int = 100
+    rate_limit_write_rate: float = 5
+    rate_limit_write_burst: int = 50
+    rate_limit_login_rate: float = 0.2
+    rate_limit_login_burst: int = 10
+    rate_limit_max_keys: int = 10000
+
+    # Production server, see app/serve.py. Workers default to the CPU quota.
+    port: int = 8080
+    server_host: str = "0.0.0.0"
+    server_workers: int | None = None
+    server_backlog: int = 2048
+    server_keep_alive: int = 5
+    server_graceful_shutdown: int = 20
+    server_max_requests: int | None = None
+    # Comma separated IPs or CIDRs of the ingress allowed to set the client
+    # address through X-Forwarded-For.
+    server_forwarded_allow_ips: str = "127.0.0.1"
+
+    # Span exporters, like TRACING_EXPORTERS='["console", "file"]'.
+    tracing_exporters: list[str] = []
+    tracing_file: str = "traces.jsonl"
+
+    # MongoDB commands slower than this are logged with their query shape.
+    slow_command_ms: float = 100
+
+    # Logs dated further back are moved to log_archives, see
+    # app/utilities/archive.py.
+    archive_after_days: int = 365
+
+    # Log deletes are kept this long for the changes feed, older sync tokens
+    # need a full sync.
+    tombstone_retention_days: int = 90
+    # Changes stamped this long before a sync token are sent again, so
+    # writes committed late, like batched inserts or ones from a worker
+    # with a slower clock, are not skipped. Clients dedupe by id.
+    changes_lag_ms: int = 10000
+
+    # Time budget of a request, per endpoint name like
+    # DEADLINE_ROUTES_MS='{"search_logs": 3000}', falling back to DEADLINE_MS.
+    # Clients can shorten it with an X-Timeout-Ms header.
+    deadline_ms: float = 10000
+    deadline_routes_ms: dict[str, float] = {"login": 5000, "refresh": 5000}
+
+    # Circuit breakers open after this many failures in a row, and let a
+    # probe through after the reset timeout in seconds.
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30
+    # Verified ID tokens are cached until they expire.
+    auth_token_cache_size: int = 10000
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
@@ -0,0 +1,67 @@
+import time
+from typing import Any
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from firebase_admin.auth import CertificateFetchError, InvalidIdTokenError
+
+from app import auth
+from app.settings import settings
+from app.utilities.breaker import CircuitBreaker, CircuitOpen
+
+pytestmark = pytest.mark.asyncio
+
+
+def bearer(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+async def test_firebase_brownout(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test cached tokens keep working while Firebase is failing
+    """
+    firebase_down = False
+    calls = 0
+
+    def verify_id_token(id_token: str) -> dict[str, Any]:
+        nonlocal calls
+        calls += 1
+        if firebase_down:
+            raise CertificateFetchError("Failed to fetch public key certificates", None)
+        if id_token == "invalid":
+            raise InvalidIdTokenError("Invalid token")
+        return {"user_id": id_token, "exp": time.time() + 3600}
+
+    breaker = CircuitBreaker("test_firebase", failure_threshold=2, reset_timeout=60)
+    monkeypatch.setattr(settings, "testing", False)
+    monkeypatch.setattr(auth, "verify_id_token", verify_id_token)
+    monkeypatch.setattr(auth, "firebase_breaker", breaker)
+    monkeypatch.setattr(auth, "verified_tokens", type(auth.verified_tokens)())
+
+    assert not auth.is_verified("dog")
+    assert await auth.validate_access(bearer("dog")) == "dog"
+    assert await auth.validate_access(bearer("dog")) == "dog"
+    assert calls == 1
+    assert auth.is_verified("dog")
+
+    # Invalid tokens are not Firebase's fault
+    for _ in range(2):
+        with pytest.raises(HTTPException) as e:
+            await auth.validate_access(bearer("invalid"))
+        assert e.value.status_code == 401
+    assert breaker.state == "closed"
+
+    firebase_down = True
+    for _ in range(2):
+        with pytest.raises(HTTPException) as e:
+            await auth.validate_access(bearer("cat"))
+        assert e.value.status_code == 503
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpen):
+        await auth.validate_access(bearer("cat"))
+    assert calls == 5
+
+    # Verified tokens still work
+    assert await auth.validate_access(bearer("dog")) == "dog"
@@ -0,0 +1,99 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+import uvicorn
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from app import rate_limit
+from app.rate_limit import rate_limit_login
+from app.serve import cpu_quota, main, worker_count
+from app.settings import settings
+
+
+def test_cpu_quota(tmp_path: Path) -> None:
+    """
+    Test reading the cgroup CPU limit
+    """
+    # No cgroup files
+    assert cpu_quota(tmp_path) is None
+    assert worker_count(tmp_path) >= 1
+
+    # cgroup v2
+    (tmp_path / "cpu.max").write_text("300000 100000\n")
+    assert cpu_quota(tmp_path) == 3
+    assert worker_count(tmp_path) <= 3
+
+    (tmp_path / "cpu.max").write_text("30000 100000\n")
+    assert cpu_quota(tmp_path) == 0.3
+    assert worker_count(tmp_path) == 1
+
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert cpu_quota(tmp_path) is None
+
+    # cgroup v1
+    (tmp_path / "cpu.max").unlink()
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("150000\n")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+    assert cpu_quota(tmp_path) == 1.5
+
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+    assert cpu_quota(tmp_path) is None
+
+
+def test_forwarded_allow_ips(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test only trusting X-Forwarded-For from the ingress
+    """
+    options: dict[str, Any] = {}
+    monkeypatch.setattr(uvicorn, "run", lambda app, **kwargs: options.update(kwargs))
+    monkeypatch.setattr(settings, "server_forwarded_allow_ips", "10.0.0.0/8")
+
+    main()
+    assert options["proxy_headers"]
+    assert options["forwarded_allow_ips"] == "10.0.0.0/8"
+
+
+@pytest.mark.asyncio
+async def test_login_rate_limit_client_ip(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test login limits key on the client address the ingress forwarded
+    """
+    keys = []
+    acquire = rate_limit.limiter.acquire
+
+    async def record(budget: str, key: str) -> Any:
+        keys.append(key)
+        return await acquire(budget, key)
+
+    monkeypatch.setattr(rate_limit.limiter, "acquire", record)
+
+    app = FastAPI()
+
+    @app.get("/login", dependencies=[Depends(rate_limit_login)])
+    async def login() -> None:
+        pass
+
+    # What uvicorn runs with the deployment's settings
+    proxied = ProxyHeadersMiddleware(
+        app,  # type: ignore[arg-type]
+        trusted_hosts="130.211.0.0/22,35.191.0.0/16,203.0.113.7",
+    )
+
+    async def login_from(peer: str, forwarded_for: str) -> None:
+        client = AsyncClient(
+            transport=ASGITransport(app=proxied, client=(peer, 1234)),  # type: ignore[arg-type]
+            base_url="http://test",
+        )
+        r = await client.get("/login", headers={"X-Forwarded-For": forwarded_for})
+        assert r.status_code == 200
+
+    # Through the load balancer, a spoofed first entry is ignored
+    await login_from("35.191.4.2", "6.6.6.6, 198.51.100.5, 203.0.113.7")
+    # Straight to the pod, the header is not trusted at all
+    await login_from("10.8.0.1", "198.51.100.5")
+
+    assert keys == ["ip:198.51.100.5", "ip:10.8.0.1"]
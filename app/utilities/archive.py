@@ -0,0 +1,292 @@
+"""
+Move logs older than `ARCHIVE_AFTER_DAYS` into compressed monthly buckets.
+
+Each user gets one `log_archives` document per month of log dates, holding
+the logs as a zlib compressed BSON payload. Runs are safe to repeat or
+interrupt: buckets are written before logs are removed from `logs`, and
+logs changed or deleted while being archived are taken back out of their
+bucket, changed ones stay behind for the next run. Archived logs that are
+updated or deleted are restored into `logs` first.
+
+    $ uv run python -m app.utilities.archive
+    $ uv run python -m app.utilities.archive --days 90
+"""
+
+import argparse
+import asyncio
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterable
+
+import bson
+from bson import ObjectId
+
+from app.settings import settings
+
+from .clients import get_db
+from .log import logger
+
+
+def as_utc(value: datetime) -> datetime:
+    """
+    Naive UTC datetime, the way documents come back from MongoDB.
+    """
+    if value.tzinfo is None:
+        return value
+
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def archive_cutoff() -> datetime:
+    """
+    Logs dated before this may have been archived.
+    """
+    return as_utc(datetime.now(timezone.utc)) - timedelta(
+        days=settings.archive_after_days
+    )
+
+
+def month_of(value: datetime) -> str:
+    """
+    Bucket month of a log date, like `2024-10`.
+    """
+    return as_utc(value).strftime("%Y-%m")
+
+
+def changed_at(doc: dict[str, Any]) -> datetime:
+    """
+    When a log was last changed. Logs written before updated_at was tracked
+    only have created_at.
+    """
+    value: datetime = doc.get("updated_at") or doc["created_at"]
+    return value
+
+
+def pack(user_id: str, month: str, logs: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Bucket document holding `logs`.
+    """
+    logs = sorted(logs, key=lambda doc: (doc["date"], doc["_id"]))
+    return {
+        "user_id": user_id,
+        "month": month,
+        "count": len(logs),
+        "log_ids": [doc["_id"] for doc in logs],
+        # Latest change of its logs, so syncs can skip the bucket.
+        "updated_at": max(changed_at(doc) for doc in logs),
+        "payload": zlib.compress(bson.encode({"logs": logs})),
+    }
+
+
+def unpack(bucket: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    Logs held in a bucket document.
+    """
+    logs: list[dict[str, Any]] = bson.decode(zlib.decompress(bucket["payload"]))["logs"]
+    return logs
+
+
+async def update_bucket(
+    user_id: str, month: str, change: Callable[[dict[ObjectId, Any]], None]
+) -> None:
+    """
+    Apply `change` to the logs of a bucket by id, retrying when another
+    writer changed the bucket in between. Empty buckets are removed.
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    db = get_db()
+    while True:
+        bucket = await db.log_archives.find_one({"user_id": user_id, "month": month})
+        logs = {doc["_id"]: doc for doc in unpack(bucket)} if bucket else {}
+        change(logs)
+
+        if bucket is None:
+            if not logs:
+                return
+            try:
+                await db.log_archives.insert_one(pack(user_id, month, logs.values()))
+                return
+            except DuplicateKeyError:
+                continue
+
+        unchanged = {"_id": bucket["_id"], "log_ids": bucket["log_ids"]}
+        if logs:
+            result = await db.log_archives.replace_one(
+                unchanged, pack(user_id, month, logs.values())
+            )
+            if result.matched_count:
+                return
+        else:
+            deleted = await db.log_archives.delete_one(unchanged)
+            if deleted.deleted_count:
+                return
+
+
+async def archive_logs(before: datetime, batch_size: int = 1000) -> int:
+    """
+    Move logs dated before `before` into their buckets, returning how many
+    were archived.
+    """
+    db = get_db()
+    archived = 0
+    skipped: list[ObjectId] = []
+
+    while True:
+        docs = (
+            await db.logs.find({"date": {"$lt": before}, "_id": {"$nin": skipped}})
+            .limit(batch_size)
+            .to_list(None)
+        )
+        if not docs:
+            return archived
+
+        months: dict[tuple[str, str], list[dict[str, Any]]] = defaultdict(list)
+        for doc in docs:
+            months[(doc["user_id"], month_of(doc["date"]))].append(doc)
+
+        for (user_id, month), month_docs in months.items():
+
+            def add(logs: dict[ObjectId, Any]) -> None:
+                logs.update({doc["_id"]: doc for doc in month_docs})
+
+            await update_bucket(user_id, month, add)
+
+        # Only remove logs that were not updated since they were read.
+        results = await asyncio.gather(
+            *(
+                db.logs.delete_one(
+                    {"_id": doc["_id"], "updated_at": doc.get("updated_at")}
+                )
+                for doc in docs
+            )
+        )
+        kept = {
+            doc["_id"]
+            for doc, result in zip(docs, results, strict=True)
+            if not result.deleted_count
+        }
+        archived += len(docs) - len(kept)
+        if not kept:
+            continue
+
+        # Logs updated or deleted in the meantime must not linger in buckets.
+        for (user_id, month), month_docs in months.items():
+            stale = {doc["_id"] for doc in month_docs} & kept
+
+            def remove(logs: dict[ObjectId, Any]) -> None:
+                for object_id in stale:
+                    logs.pop(object_id, None)
+
+            if stale:
+                await update_bucket(user_id, month, remove)
+        skipped += kept
+
+
+async def restore_archived_log(object_id: ObjectId, user_id: str | None) -> bool:
+    """
+    Move the user's archived log back into `logs`, so it can be updated or
+    deleted. Returns whether there was one.
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    db = get_db()
+    bucket = await db.log_archives.find_one({"log_ids": object_id, "user_id": user_id})
+    if bucket is None:
+        return False
+
+    for doc in unpack(bucket):
+        if doc["_id"] == object_id:
+            try:
+                await db.logs.insert_one(doc)
+            except DuplicateKeyError:
+                # Restored by someone else, whose copy is newer.
+                pass
+
+    await update_bucket(
+        bucket["user_id"], bucket["month"], lambda logs: logs.pop(object_id, None)
+    )
+    return True
+
+
+async def find_archived_logs(
+    user_id: str | None, start: datetime | None, end: datetime | None
+) -> list[dict[str, Any]]:
+    """
+    The user's archived logs dated from `start` up to, not including, `end`.
+    """
+    months: dict[str, str] = {}
+    if start:
+        months["$gte"] = month_of(start)
+    if end:
+        months["$lte"] = month_of(end)
+
+    query: dict[str, Any] = {"user_id": user_id}
+    if months:
+        query["month"] = months
+
+    logs = []
+    async for bucket in get_db().log_archives.find(query):
+        for doc in unpack(bucket):
+            if start and doc["date"] < as_utc(start):
+                continue
+            if end and doc["date"] >= as_utc(end):
+                continue
+            logs.append(doc)
+
+    return logs
+
+
+async def find_archived_changes(
+    user_id: str | None, after: datetime | None
+) -> list[dict[str, Any]]:
+    """
+    The user's archived logs changed after `after`, or all of them.
+    """
+    query: dict[str, Any] = {"user_id": user_id}
+    if after:
+        query["updated_at"] = {"$gt": after}
+
+    logs = []
+    async for bucket in get_db().log_archives.find(query):
+        logs += [
+            doc
+            for doc in unpack(bucket)
+            if after is None or changed_at(doc) > as_utc(after)
+        ]
+
+    return logs
+
+
+async def find_archived_logs_by_ids(
+    object_ids: list[ObjectId], user_id: str | None = None
+) -> list[dict[str, Any]]:
+    """
+    Archived logs with `object_ids`, only the user's when `user_id` is set.
+    """
+    query: dict[str, Any] = {"log_ids": {"$in": object_ids}}
+    if user_id is not None:
+        query["user_id"] = user_id
+
+    wanted = set(object_ids)
+    logs = []
+    async for bucket in get_db().log_archives.find(query):
+        logs += [doc for doc in unpack(bucket) if doc["_id"] in wanted]
+
+    return logs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--days", type=int, default=settings.archive_after_days)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    before = datetime.now(timezone.utc) - timedelta(days=args.days)
+    archived = asyncio.run(archive_logs(before, args.batch_size))
+    logger.info("Archived=%s Before=%s", archived, before.isoformat())
+
+
+if __name__ == "__main__":
+    main()
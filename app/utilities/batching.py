@@ -0,0 +1,158 @@
+import asyncio
+from contextlib import AbstractAsyncContextManager, nullcontext
+from typing import TYPE_CHECKING, Any, Callable
+
+from bson import ObjectId
+
+from .log import logger
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorCollection
+
+Document = dict[str, Any]
+SessionFactory = Callable[[list[Document]], AbstractAsyncContextManager[Any]]
+
+
+class InsertBatcher:
+    """
+    Group-commit buffer for inserts into a single collection.
+
+    Concurrent calls to `insert` are queued and written with one
+    `insert_many` once `max_size` documents are waiting or `max_delay_ms`
+    has passed since the first one, whichever comes first. Every caller
+    still receives the id of its own document.
+
+    Until `start` is called, or after `stop`, inserts go straight to
+    `insert_one`. The collection is looked up on first use.
+
+    `session` opens the session each write runs in, given the documents
+    being written.
+
+    Inserts have no deadline of their own, the write runs in a background
+    task. A caller that gives up, like a request answered with a 504,
+    before its batch is written has its document dropped. Once the batch
+    is being written the document is still inserted, so a retry of such a
+    request can create a duplicate.
+    """
+
+    def __init__(
+        self,
+        get_collection: Callable[[], "AsyncIOMotorCollection[Any]"],
+        max_size: int,
+        max_delay_ms: float,
+        session: SessionFactory | None = None,
+    ) -> None:
+        self.get_collection = get_collection
+        self.session = session or (lambda docs: nullcontext())
+        self.max_size = max_size
+        self.max_delay = max_delay_ms / 1000
+        self.queue: asyncio.Queue[tuple[Document, asyncio.Future[ObjectId]] | None] = (
+            asyncio.Queue()
+        )
+        self.task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        """
+        Start flushing queued inserts in the background.
+        """
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """
+        Flush everything still queued and stop the background task.
+        """
+        if self.task is None:
+            return
+
+        task, self.task = self.task, None
+        await self.queue.put(None)
+        await task
+
+    async def insert(self, doc: Document) -> ObjectId:
+        """
+        Insert a document, returning its id.
+        """
+        if self.task is None:
+            async with self.session([doc]) as session:
+                result = await self.get_collection().insert_one(doc, session=session)
+            inserted_id: ObjectId = result.inserted_id
+            return inserted_id
+
+        doc.setdefault("_id", ObjectId())
+        future: asyncio.Future[ObjectId] = asyncio.get_running_loop().create_future()
+        await self.queue.put((doc, future))
+
+        return await future
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self.queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self.flush(batch)
+
+        # Anything queued behind the stop marker is still owed a write.
+        pending = []
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is not None:
+                pending.append(item)
+        if pending:
+            await self.flush(pending)
+
+    async def flush(
+        self, batch: list[tuple[Document, asyncio.Future[ObjectId]]]
+    ) -> None:
+        """
+        Write a batch with one `insert_many` and resolve each caller.
+        """
+        from pymongo.errors import BulkWriteError, WriteError
+
+        # Callers that gave up while queued do not get their document written.
+        batch = [(doc, future) for doc, future in batch if not future.done()]
+        if not batch:
+            return
+
+        docs = [doc for doc, _ in batch]
+        errors: dict[int, Exception] = {}
+        try:
+            async with self.session(docs) as session:
+                await self.get_collection().insert_many(
+                    docs, ordered=False, session=session
+                )
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                errors[error["index"]] = WriteError(
+                    error.get("errmsg", ""), error.get("code"), error
+                )
+        except Exception as e:
+            logger.exception("Batched insert of %s documents failed", len(batch))
+            errors = {index: e for index in range(len(batch))}
+
+        for index, (doc, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in errors:
+                future.set_exception(errors[index])
+            else:
+                future.set_result(doc["_id"])
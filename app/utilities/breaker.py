@@ -0,0 +1,102 @@
+import math
+import time
+from typing import Any
+
+from . import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """
+    A dependency is failing and calls to it are being rejected, answered
+    with a 503.
+    """
+
+    def __init__(self, name: str, retry_after: int) -> None:
+        super().__init__(f"Circuit {name} is open.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a dependency keeps failing.
+
+    After `failure_threshold` failures in a row the circuit opens and calls
+    are rejected for `reset_timeout` seconds. Then it is half open: a single
+    probe call goes through, closing the circuit if it succeeds and opening
+    it again if it fails.
+    """
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, reset_timeout: float = 30
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.opened = 0
+        self.rejected = 0
+
+        metrics.register(f"breaker.{name}", self.stats)
+
+    def before(self) -> None:
+        """
+        Raise CircuitOpen unless a call may go through now.
+        """
+        if self.state == OPEN:
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpen(self.name, math.ceil(self.reset_timeout - waited))
+            self.state = HALF_OPEN
+
+        if self.state == HALF_OPEN:
+            if self.probing:
+                self.rejected += 1
+                raise CircuitOpen(self.name, math.ceil(self.reset_timeout))
+            self.probing = True
+
+    def success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self.probing = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def cancel(self) -> None:
+        """
+        Forget a call let through by `before` whose outcome says nothing
+        about the dependency, like one that ran out of the client's time.
+        """
+        self.probing = False
+
+    def record(self, ok: bool) -> None:
+        """
+        Record the outcome of a call let through by `before`.
+        """
+        if ok:
+            self.success()
+        else:
+            self.failure()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
@@ -1,13 +1,16 @@
-from typing import Any
-
-import firebase_admin
-from firebase_admin import credentials
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from functools import cache
+from typing import TYPE_CHECKING, Any
 
 from app.settings import settings
 
+# Client libraries are slow to import, they are loaded on first use.
+if TYPE_CHECKING:
+    import httpx
+    from motor.motor_asyncio import AsyncIOMotorDatabase
+
 
-def get_db() -> AsyncIOMotorDatabase[Any]:
+@cache
+def get_db() -> "AsyncIOMotorDatabase[Any]":
     """
     Get MongoDB
     """
@@ -17,21 +20,60 @@ def get_db() -> AsyncIOMotorDatabase[Any]:
         mock_db: AsyncIOMotorDatabase[Any] = AsyncMongoMockClient()["poopyrus"]
         return mock_db
     else:
-        return AsyncIOMotorClient(settings.mongo_uri, tlsAllowInvalidCertificates=True)[
-            "poopyrus"
-        ]
-
-
-db = get_db()
-
-firebase_admin.initialize_app(
-    credentials.Certificate(
-        {
-            "type": "service_account",
-            "project_id": settings.google_project,
-            "private_key": settings.google_auth_pk,
-            "client_email": settings.google_auth_client_email,
-            "token_uri": settings.google_auth_token_uri,
-        }
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        from .mongo_replies import ReplyListener
+        from .query_audit import SlowCommandLogger
+        from .tracing.mongo import CommandTracer
+
+        return AsyncIOMotorClient(
+            settings.mongo_uri,
+            tlsAllowInvalidCertificates=True,
+            event_listeners=[
+                CommandTracer(),
+                ReplyListener(),
+                SlowCommandLogger(settings.slow_command_ms),
+            ],
+        )["poopyrus"]
+
+
+@cache
+def init_firebase() -> None:
+    """
+    Initialize the Firebase Admin SDK
+    """
+    import firebase_admin
+    from firebase_admin import credentials
+
+    firebase_admin.initialize_app(
+        credentials.Certificate(
+            {
+                "type": "service_account",
+                "project_id": settings.google_project,
+                "private_key": settings.google_auth_pk,
+                "client_email": settings.google_auth_client_email,
+                "token_uri": settings.google_auth_token_uri,
+            }
+        )
     )
-)
+
+
+@cache
+def get_http_client() -> "httpx.AsyncClient":
+    """
+    Get the shared HTTP client
+    """
+    import httpx
+
+    from .tracing.http import TracingTransport
+
+    return httpx.AsyncClient(transport=TracingTransport(httpx.AsyncHTTPTransport()))
+
+
+async def close_http_client() -> None:
+    """
+    Close the shared HTTP client if it was used
+    """
+    if get_http_client.cache_info().currsize:
+        await get_http_client().aclose()
+        get_http_client.cache_clear()
@@ -0,0 +1,265 @@
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Protocol
+
+import brotli
+import zstandard
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import metrics
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class GzipCompressor:
+    def __init__(self, level: int = 6) -> None:
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush so each streamed chunk reaches the client right away.
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int = 4) -> None:
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        chunk: bytes = self.compressor.process(data) + self.compressor.flush()
+        return chunk
+
+    def finish(self) -> bytes:
+        chunk: bytes = self.compressor.finish()
+        return chunk
+
+
+class ZstdCompressor:
+    def __init__(self, level: int = 3) -> None:
+        self.flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        chunk: bytes = self.compressor.compress(data) + self.compressor.flush(
+            self.flush_block
+        )
+        return chunk
+
+    def finish(self) -> bytes:
+        chunk: bytes = self.compressor.flush()
+        return chunk
+
+
+def available_compressors() -> dict[str, Callable[[], Compressor]]:
+    """
+    Compressors by content coding, most preferred first.
+    """
+    return {"zstd": ZstdCompressor, "br": BrotliCompressor, "gzip": GzipCompressor}
+
+
+def negotiate(accept_encoding: str, supported: list[str]) -> str | None:
+    """
+    Pick a content coding from an Accept-Encoding header.
+
+    Highest q-value wins, ties go to the earliest entry in `supported`.
+    """
+    weights: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip()] = q
+
+    best: str | None = None
+    best_q = 0.0
+    for coding in supported:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+
+    return best
+
+
+class CompressedCache:
+    """
+    Small LRU of compressed bodies keyed by encoding and body digest.
+
+    Identical responses, like a list that has not changed, are compressed
+    once and served from memory after that. Holds at most `size` bodies
+    and `max_bytes` of compressed data.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        compressors: dict[str, Callable[[], Compressor]],
+        max_bytes: int = 16 * 1024 * 1024,
+    ) -> None:
+        self.size = size
+        self.max_bytes = max_bytes
+        self.compressors = compressors
+        self.entries: OrderedDict[tuple[str, bytes], bytes] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, encoding: str, body: bytes) -> bytes:
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = self.entries.get(key)
+        if compressed is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return compressed
+
+        self.misses += 1
+        compressor = self.compressors[encoding]()
+        compressed = compressor.compress(body) + compressor.finish()
+        if self.size and len(compressed) <= self.max_bytes:
+            self.entries[key] = compressed
+            self.bytes += len(compressed)
+            while len(self.entries) > self.size or self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+        return compressed
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with gzip, brotli or zstd based on Accept-Encoding.
+
+    Bodies smaller than `minimum_size` are sent as is. Streaming responses
+    are compressed chunk by chunk.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        cache_size: int = 256,
+        cache_bytes: int = 16 * 1024 * 1024,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compressors = available_compressors()
+        self.cache = CompressedCache(cache_size, self.compressors, cache_bytes)
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        metrics.register("compression", self.stats)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(
+            Headers(scope=scope).get("accept-encoding", ""), list(self.compressors)
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "encodings": list(self.compressors),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_bytes": self.cache.bytes,
+        }
+
+
+class CompressionResponder:
+    def __init__(
+        self, middleware: CompressionMiddleware, encoding: str, send: Send
+    ) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start: Message | None = None
+        self.compressor: Compressor | None = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            # Already encoded bodies and compressed media would not shrink.
+            self.passthrough = "content-encoding" in headers or headers.get(
+                "content-type", ""
+            ).startswith(("image/", "video/", "audio/"))
+            if self.passthrough:
+                await self.downstream(message)
+            else:
+                self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.downstream(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+
+            if not more_body:
+                if len(body) < self.middleware.minimum_size:
+                    self.passthrough = True
+                    await self.downstream(start)
+                    await self.downstream(message)
+                    return
+
+                compressed = self.middleware.cache.get(self.encoding, body)
+                self.middleware.bytes_in += len(body)
+                self.middleware.bytes_out += len(compressed)
+
+                headers["Content-Encoding"] = self.encoding
+                headers["Content-Length"] = str(len(compressed))
+                headers.add_vary_header("Accept-Encoding")
+                await self.downstream(start)
+                await self.downstream(
+                    {"type": "http.response.body", "body": compressed}
+                )
+                return
+
+            self.compressor = self.middleware.compressors[self.encoding]()
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self.downstream(start)
+
+        if self.compressor is None:
+            await self.downstream(message)
+            return
+
+        chunk = self.compressor.compress(body) if body else b""
+        if not more_body:
+            chunk += self.compressor.finish()
+
+        self.middleware.bytes_in += len(body)
+        self.middleware.bytes_out += len(chunk)
+        await self.downstream(
+            {"type": "http.response.body", "body": chunk, "more_body": more_body}
+        )
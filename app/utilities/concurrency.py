@@ -0,0 +1,194 @@
+import json
+import math
+import time
+from typing import Any, Callable
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import metrics
+
+
+class AdaptiveLimiter:
+    """
+    Cap on in-flight requests adjusted from observed latency (AIMD).
+
+    The limit grows by roughly one every `limit` fast responses while it is
+    in use, and is cut by `backoff` when a response is slow, at most once
+    per `target_latency`. A response is slow when it takes longer than
+    `target_latency` and `tolerance` times its route's usual latency, so
+    routes waiting on other services, like login, are judged against
+    themselves. Low priority requests only get `1 - reserve` of the limit,
+    so there is always room for high priority ones.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        target_latency: float,
+        backoff: float = 0.9,
+        reserve: float = 0.2,
+        tolerance: float = 2.0,
+        smoothing: float = 0.05,
+    ) -> None:
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.reserve = reserve
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        # Moving average of the latency of each route's normal responses.
+        self.baselines: dict[str, float] = {}
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.accepted = 0
+        self.rejected = 0
+
+    def try_acquire(self, priority: bool) -> bool:
+        """
+        Take a slot, or return False if the limit is reached.
+        """
+        limit = self.limit if priority else self.limit * (1 - self.reserve)
+        if self.in_flight >= max(1, math.floor(limit)):
+            self.rejected += 1
+            return False
+
+        self.in_flight += 1
+        self.accepted += 1
+        return True
+
+    def is_slow(self, latency: float, route: str | None) -> bool:
+        """
+        Whether a response took too long, learning the route's usual latency.
+        """
+        if route is None:
+            return latency > self.target_latency
+
+        baseline = self.baselines.get(route)
+        if baseline is None:
+            self.baselines[route] = latency
+            return False
+
+        self.baselines[route] = baseline + self.smoothing * (latency - baseline)
+        return latency > max(self.target_latency, self.tolerance * baseline)
+
+    def release(
+        self, latency: float, overloaded: bool = False, route: str | None = None
+    ) -> None:
+        """
+        Give a slot back and adjust the limit from how long it was held.
+        """
+        in_use = self.in_flight >= self.limit / 2
+        self.in_flight -= 1
+
+        if overloaded or self.is_slow(latency, route):
+            now = time.monotonic()
+            if now - self.last_decrease >= self.target_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self.last_decrease = now
+        elif in_use:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+        }
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Shed load with a fast 503 once the adaptive limit is reached.
+
+    Requests with a bearer token that `verified` accepts are high priority,
+    anything else, anonymous writes included, is low priority. `verified`
+    should be cheap, like a lookup of tokens `validate_access` already
+    verified, so a token's first request is low priority.
+
+    Only 504s count as overload. 503s come from open circuit breakers and
+    failing dependencies, which fewer requests in flight would not fix.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        initial_limit: int = 20,
+        min_limit: int = 2,
+        max_limit: int = 200,
+        target_latency_ms: float = 250,
+        reserve: float = 0.2,
+        tolerance: float = 2.0,
+        retry_after: int = 1,
+        verified: Callable[[str], bool] | None = None,
+    ) -> None:
+        self.app = app
+        self.retry_after = retry_after
+        self.verified = verified
+        self.limiter = AdaptiveLimiter(
+            initial_limit=initial_limit,
+            min_limit=min_limit,
+            max_limit=max_limit,
+            target_latency=target_latency_ms / 1000,
+            reserve=reserve,
+            tolerance=tolerance,
+        )
+
+        metrics.register("concurrency", self.limiter.stats)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if not self.limiter.try_acquire(self.is_priority(scope)):
+            await self.reject(send)
+            return
+
+        status_code = 500
+        start = time.monotonic()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Running out of a deadline the client shortened is not overload.
+            client_deadline = scope.get("state", {}).get("client_deadline", False)
+            route = scope.get("route")
+            self.limiter.release(
+                time.monotonic() - start,
+                overloaded=status_code == 504 and not client_deadline,
+                route=getattr(route, "path", None),
+            )
+
+    def is_priority(self, scope: Scope) -> bool:
+        scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or self.verified is None:
+            return False
+
+        return self.verified(token)
+
+    async def reject(self, send: Send) -> None:
+        body = json.dumps({"detail": "Server is busy."}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(self.retry_after).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
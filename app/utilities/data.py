@@ -0,0 +1,214 @@
+import sys
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import cache
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterable
+
+from app.settings import settings
+
+from .breaker import CircuitBreaker
+from .clients import get_db
+from .deadline import client_deadline, expired, is_timeout
+from .tracing import current_span
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorCollection
+
+# Latest (cluster time, operation time) seen for each user's writes, in
+# this process only.
+causal_times: OrderedDict[str, tuple[Any, Any]] = OrderedDict()
+CAUSAL_TIMES_SIZE = 10000
+
+
+@dataclass
+class MongoReplies:
+    """
+    How many MongoDB commands of a request got a reply.
+    """
+
+    count: int = 0
+
+
+# Replies to the current request's MongoDB commands, counted by
+# `app.utilities.mongo_replies.ReplyListener`.
+mongo_replies: ContextVar[MongoReplies | None] = ContextVar(
+    "mongo_replies", default=None
+)
+
+# Context reads shared between requests keep from the request that started
+# them: its trace, and the replies its commands get.
+SHARED_READ_CONTEXT = (current_span, mongo_replies)
+
+mongo_breaker = CircuitBreaker(
+    "mongo",
+    failure_threshold=settings.breaker_failure_threshold,
+    reset_timeout=settings.breaker_reset_timeout,
+)
+
+
+@cache
+def get_read_collection(name: str) -> "AsyncIOMotorCollection[Any]":
+    """
+    Get a collection for list style reads that may go to secondaries.
+
+    Uses `settings.read_preference` and `settings.read_max_staleness` with
+    majority read concern, so causally consistent sessions can guarantee a
+    user sees their own writes.
+    """
+    from pymongo import read_preferences
+    from pymongo.read_concern import ReadConcern
+
+    modes = {
+        "primary": read_preferences.Primary,
+        "primaryPreferred": read_preferences.PrimaryPreferred,
+        "secondary": read_preferences.Secondary,
+        "secondaryPreferred": read_preferences.SecondaryPreferred,
+        "nearest": read_preferences.Nearest,
+    }
+    mode = modes[settings.read_preference]
+    read_preference = (
+        mode()
+        if mode is read_preferences.Primary
+        else mode(max_staleness=settings.read_max_staleness)
+    )
+
+    return get_db().get_collection(
+        name, read_preference=read_preference, read_concern=ReadConcern("majority")
+    )
+
+
+@cache
+def get_write_collection(name: str, endpoint: str) -> "AsyncIOMotorCollection[Any]":
+    """
+    Get a collection writing with the write concern configured for an
+    endpoint in `settings.write_concerns`, or `settings.write_concern`.
+    """
+    from pymongo.write_concern import WriteConcern
+
+    w = settings.write_concerns.get(endpoint, settings.write_concern)
+    if w is None:
+        return get_db().get_collection(name)
+
+    return get_db().get_collection(name, write_concern=WriteConcern(w=w))
+
+
+@asynccontextmanager
+async def causal_session(
+    *user_ids: str | None,
+) -> AsyncIterator["AsyncIOMotorClientSession | None"]:
+    """
+    Causally consistent session that has seen the users' latest writes.
+
+    Reads in the session wait for a secondary to catch up with those
+    writes, and writes in the session are remembered for later reads.
+    Yields None when sessions are not supported, like with mongomock.
+
+    Writes are only remembered by the process that made them. A read
+    handled by another worker or pod can still miss them until the
+    secondary catches up, within `settings.read_max_staleness`.
+    """
+    if settings.testing:
+        yield None
+        return
+
+    async with await get_db().client.start_session(causal_consistency=True) as session:
+        for user_id in user_ids:
+            if user_id is not None and user_id in causal_times:
+                cluster_time, operation_time = causal_times[user_id]
+                session.advance_cluster_time(cluster_time)
+                session.advance_operation_time(operation_time)
+
+        yield session
+
+        if session.operation_time is not None:
+            remember(user_ids, session.cluster_time, session.operation_time)
+
+
+def remember(
+    user_ids: Iterable[str | None], cluster_time: Any, operation_time: Any
+) -> None:
+    """
+    Keep the latest causal times for each user.
+    """
+    for user_id in user_ids:
+        if user_id is None:
+            continue
+        if user_id in causal_times and causal_times[user_id][1] >= operation_time:
+            causal_times.move_to_end(user_id)
+            continue
+
+        causal_times[user_id] = (cluster_time, operation_time)
+        causal_times.move_to_end(user_id)
+        if len(causal_times) > CAUSAL_TIMES_SIZE:
+            causal_times.popitem(last=False)
+
+
+def causal_time(user_id: str | None) -> Any:
+    """
+    Operation time of the user's latest write seen by this process. Part of
+    shared read keys, so a read started before a write is never handed to
+    a caller that has seen the write.
+    """
+    times = causal_times.get(user_id) if user_id is not None else None
+    return times[1] if times else None
+
+
+def mongo_failed(error: BaseException) -> bool:
+    """
+    Whether an error means MongoDB is unreachable or too slow, rather than
+    a problem with the request.
+    """
+    errors = sys.modules.get("pymongo.errors")
+    if errors is None:
+        return False
+
+    return isinstance(error, errors.ConnectionFailure) or (
+        isinstance(error, errors.PyMongoError) and bool(error.timeout)
+    )
+
+
+def mongo_replied() -> None:
+    """
+    Count a reply from MongoDB to the current request.
+    """
+    replies = mongo_replies.get()
+    if replies is not None:
+        replies.count += 1
+
+
+async def mongo_circuit() -> AsyncIterator[None]:
+    """
+    Router dependency failing fast while MongoDB keeps failing.
+
+    MongoDB being unreachable, or the request running out of the server's
+    deadline, counts as a failure. Requests only count as a success once
+    MongoDB replied to one of their commands, so requests rejected before
+    reaching it, or waiting on a read another request started, are not
+    counted. Neither are requests running out of a deadline the client
+    shortened, or cancelled by the client going away.
+    """
+    mongo_breaker.before()
+    replies = MongoReplies()
+    token = mongo_replies.set(replies)
+    try:
+        yield
+    except BaseException as e:
+        timed_out = is_timeout(e) or not isinstance(e, Exception)
+        if timed_out and client_deadline.get():
+            mongo_breaker.cancel()
+        elif mongo_failed(e) or (timed_out and expired()):
+            mongo_breaker.failure()
+        elif replies.count:
+            mongo_breaker.success()
+        else:
+            mongo_breaker.cancel()
+        raise
+    finally:
+        mongo_replies.reset(token)
+
+    if replies.count:
+        mongo_breaker.success()
+    else:
+        mongo_breaker.cancel()
@@ -0,0 +1,142 @@
+import asyncio
+import sys
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from app.settings import settings
+
+from . import metrics
+
+# Header a client can set to shorten the deadline of its request.
+TIMEOUT_HEADER = "X-Timeout-Ms"
+
+# Monotonic time the current request has to finish by.
+request_deadline: ContextVar[float | None] = ContextVar(
+    "request_deadline", default=None
+)
+
+# Whether the client shortened the current request's deadline.
+client_deadline: ContextVar[bool] = ContextVar("client_deadline", default=False)
+
+
+class DeadlineExceeded(Exception):
+    """
+    The request ran out of time, answered with a 504.
+    """
+
+
+def remaining(default: float | None = None) -> float | None:
+    """
+    Seconds left before the request deadline, or `default` outside of a
+    request. Raises DeadlineExceeded once the deadline has passed.
+    """
+    deadline = request_deadline.get()
+    if deadline is None:
+        return default
+
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded()
+
+    return left
+
+
+def expired() -> bool:
+    """
+    Whether the current request's deadline has passed.
+    """
+    deadline = request_deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def is_timeout(error: BaseException) -> bool:
+    """
+    Whether an error means a dependency ran out of time. Client libraries
+    are only checked once something has imported them.
+    """
+    if isinstance(error, (DeadlineExceeded, TimeoutError)):
+        return True
+
+    httpx = sys.modules.get("httpx")
+    if httpx and isinstance(error, httpx.TimeoutException):
+        return True
+
+    errors = sys.modules.get("pymongo.errors")
+    if errors and isinstance(error, errors.PyMongoError):
+        return bool(error.timeout)
+
+    return False
+
+
+def client_timed_out(error: BaseException) -> bool:
+    """
+    Whether an error is the request running out of a deadline the client
+    shortened, which says nothing about the dependency it was waiting on.
+    """
+    return client_deadline.get() and is_timeout(error)
+
+
+def route_timeout(name: str, headers: Any) -> tuple[float, bool]:
+    """
+    Seconds a request to the endpoint `name` may take, from
+    `settings.deadline_routes_ms` or `settings.deadline_ms`, shortened by
+    the timeout header, and whether the header shortened it.
+    """
+    timeout_ms = settings.deadline_routes_ms.get(name, settings.deadline_ms)
+    shortened = False
+    try:
+        header_ms = float(headers.get(TIMEOUT_HEADER, "inf"))
+        if header_ms < timeout_ms:
+            timeout_ms, shortened = header_ms, True
+    except ValueError:
+        pass
+
+    return max(timeout_ms, 1) / 1000, shortened
+
+
+class DeadlineRoute(APIRoute):
+    """
+    Run each request, dependencies included, within its deadline.
+
+    The deadline also bounds every MongoDB operation through pymongo's
+    client side operation timeout, which sets `maxTimeMS`. Running out of
+    time anywhere raises DeadlineExceeded.
+
+    Deadlines shortened by the client are flagged in `client_deadline` and
+    `request.state.client_deadline`, so their timeouts are not taken as
+    the server or its dependencies being slow.
+    """
+
+    exceeded = 0
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def deadline_handler(request: Request) -> Response:
+            import pymongo
+
+            timeout, shortened = route_timeout(self.name, request.headers)
+            request.state.client_deadline = shortened
+            token = request_deadline.set(time.monotonic() + timeout)
+            client_token = client_deadline.set(shortened)
+            try:
+                with pymongo.timeout(timeout):
+                    async with asyncio.timeout(timeout):
+                        return await handler(request)
+            except Exception as e:
+                if is_timeout(e):
+                    DeadlineRoute.exceeded += 1
+                    raise DeadlineExceeded() from e
+                raise
+            finally:
+                request_deadline.reset(token)
+                client_deadline.reset(client_token)
+
+        return deadline_handler
+
+
+metrics.register("deadlines", lambda: {"exceeded": DeadlineRoute.exceeded})
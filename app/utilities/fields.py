@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException, Response, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def parse_fields(fields: str | None, model: type[BaseModel]) -> list[str] | None:
+    """
+    Parse a comma separated `fields` query parameter against a model.
+
+    `id` is always included. Raises a 400 HTTPException for unknown fields.
+    """
+    if fields is None:
+        return None
+
+    names = ["id"]
+    for name in fields.split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+
+    unknown = [name for name in names if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}.",
+        )
+
+    return names
+
+
+def to_projection(fields: list[str] | None, *extra: str) -> dict[str, int] | None:
+    """
+    Mongo projection for the requested fields, plus any `extra` ones the
+    query needs for itself.
+    """
+    if fields is None:
+        return None
+
+    return {"_id": 1} | {name: 1 for name in [*fields, *extra] if name != "id"}
+
+
+def dump_fields(doc: dict[str, Any], fields: list[str]) -> dict[str, Any]:
+    """
+    Serialize only the requested fields of a document.
+    """
+    result: dict[str, Any] = {}
+    for name in fields:
+        if name == "id":
+            result[name] = str(doc["_id"])
+            continue
+
+        value = doc.get(name)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        result[name] = value
+
+    return result
+
+
+def json_response(content: Any, response: Response) -> JSONResponse:
+    """
+    JSON response keeping the headers dependencies set on `response`, like
+    the rate limit ones.
+    """
+    return JSONResponse(content, headers=dict(response.headers))
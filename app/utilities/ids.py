@@ -0,0 +1,38 @@
+import bson
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+MAX_IDS = 100
+
+
+def parse_object_ids(ids: str, name: str) -> list[ObjectId]:
+    """
+    Parse a comma separated `ids` query parameter into ObjectIds.
+
+    Raises a 400 HTTPException listing every invalid id, or when more than
+    `MAX_IDS` are requested.
+    """
+    object_ids = []
+    invalid = []
+    for value in ids.split(","):
+        value = value.strip()
+        if not value:
+            continue
+        try:
+            object_ids.append(ObjectId(value))
+        except bson.errors.InvalidId:
+            invalid.append(value)
+
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {name} id format: {', '.join(invalid)}.",
+        )
+
+    if len(object_ids) > MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_IDS} ids can be requested.",
+        )
+
+    return object_ids
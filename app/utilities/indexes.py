@@ -0,0 +1,62 @@
+from typing import Any
+
+from app.settings import settings
+from app.utilities.clients import get_db
+
+# Relevance weights of the fields in the logs text index.
+LOG_TEXT_WEIGHTS = {"name": 2, "note": 1}
+
+# (collection, keys, options) of the indexes the routers query by.
+INDEXES: list[tuple[str, list[tuple[str, Any]], dict[str, Any]]] = [
+    ("logs", [("user_id", 1), ("updated_at", 1)], {}),
+    ("logs", [("user_id", 1), ("date", 1)], {}),
+    # The archive job finds old logs across users.
+    ("logs", [("date", 1)], {}),
+    ("log_tombstones", [("user_id", 1), ("updated_at", 1)], {}),
+    (
+        "log_tombstones",
+        [("updated_at", 1)],
+        {"expireAfterSeconds": settings.tombstone_retention_days * 24 * 60 * 60},
+    ),
+    ("log_archives", [("user_id", 1), ("month", 1)], {"unique": True}),
+    ("log_archives", [("log_ids", 1)], {}),
+    # The user_id prefix scopes every search to one user's logs.
+    (
+        "logs",
+        [("user_id", 1)] + [(field, "text") for field in LOG_TEXT_WEIGHTS],
+        {"weights": LOG_TEXT_WEIGHTS, "name": "logs_text"},
+    ),
+]
+
+
+def index_name(keys: list[tuple[str, Any]], options: dict[str, Any]) -> str:
+    """
+    Name MongoDB gives an index, unless one is set in its options.
+    """
+    name: str = options.get("name") or "_".join(f"{k}_{v}" for k, v in keys)
+    return name
+
+
+async def create_indexes() -> None:
+    """
+    Create the MongoDB indexes the routers query by.
+    """
+    db = get_db()
+
+    for collection, keys, options in INDEXES:
+        await db[collection].create_index(keys, **options)
+
+
+async def missing_indexes() -> list[str]:
+    """
+    Indexes from `INDEXES` that do not exist, as `collection.name`.
+    """
+    db = get_db()
+
+    missing = []
+    for collection, keys, options in INDEXES:
+        name = index_name(keys, options)
+        if name not in await db[collection].index_information():
+            missing.append(f"{collection}.{name}")
+
+    return missing
@@ -0,0 +1,19 @@
+from typing import Any, Callable
+
+MetricsProvider = Callable[[], dict[str, Any]]
+
+providers: dict[str, MetricsProvider] = {}
+
+
+def register(name: str, provider: MetricsProvider) -> None:
+    """
+    Register a callable reporting the current state of a component.
+    """
+    providers[name] = provider
+
+
+def collect() -> dict[str, dict[str, Any]]:
+    """
+    Snapshot every registered component.
+    """
+    return {name: provider() for name, provider in providers.items()}
@@ -0,0 +1,21 @@
+from pymongo import monitoring
+
+from .data import mongo_replied
+
+
+class ReplyListener(monitoring.CommandListener):
+    """
+    Count each MongoDB reply against the request that sent the command.
+
+    Motor runs commands in threads that copy the caller's context, so the
+    request's `mongo_replies` is still current when a command succeeds.
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        mongo_replied()
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
@@ -0,0 +1,310 @@
+"""
+Explain every query shape the logs and pets routers issue.
+
+Flags collection scans and sorts done in memory, and fails when an index
+from `app.utilities.indexes.INDEXES` is missing. Pass `--strict` to also
+fail on flagged plans, except those a query is expected to have, like the
+scan of the unscoped lists.
+
+    $ uv run python -m app.utilities.query_audit
+    $ uv run python -m app.utilities.query_audit --strict
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+from bson import ObjectId
+from pymongo import monitoring
+
+from . import metrics
+from .clients import get_db
+from .indexes import missing_indexes
+from .log import logger
+from .search import search_pipeline
+
+# Where each command keeps its filter.
+FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+
+def query_shape(value: Any) -> Any:
+    """
+    A filter with its values replaced by 1, keeping fields and operators.
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return [query_shape(item) for item in value]
+
+    return 1
+
+
+def command_shape(command_name: str, command: dict[str, Any]) -> dict[str, Any]:
+    """
+    The filter, sort and pipeline shapes of a command.
+    """
+    shape: dict[str, Any] = {}
+    if command_name in FILTER_FIELDS:
+        shape["filter"] = query_shape(command.get(FILTER_FIELDS[command_name], {}))
+    if command_name == "aggregate":
+        shape["pipeline"] = query_shape(command.get("pipeline", []))
+    if command_name in ("update", "delete"):
+        statements = command.get(f"{command_name}s", [])
+        shape["filter"] = [
+            query_shape(statement.get("q", {})) for statement in statements
+        ]
+    if "sort" in command:
+        shape["sort"] = dict(command["sort"])
+
+    return shape
+
+
+class SlowCommandLogger(monitoring.CommandListener):
+    """
+    Log MongoDB commands slower than `threshold_ms` with their query shape.
+    """
+
+    def __init__(self, threshold_ms: float) -> None:
+        self.threshold_ms = threshold_ms
+        self.commands: dict[tuple[int, Any], tuple[str, Any]] = {}
+        self.slow = 0
+
+        metrics.register("slow_commands", self.stats)
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        collection = event.command.get(event.command_name)
+        self.commands[(event.request_id, event.connection_id)] = (
+            collection if isinstance(collection, str) else event.database_name,
+            event.command,
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self.finished(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self.finished(event)
+
+    def finished(
+        self, event: monitoring.CommandSucceededEvent | monitoring.CommandFailedEvent
+    ) -> None:
+        collection, command = self.commands.pop(
+            (event.request_id, event.connection_id), (None, None)
+        )
+        duration_ms = event.duration_micros / 1000
+        if command is None or duration_ms < self.threshold_ms:
+            return
+
+        self.slow += 1
+        logger.warning(
+            "SlowCommand=%s Collection=%s Duration=%.1fms Shape=%s",
+            event.command_name,
+            collection,
+            duration_ms,
+            json.dumps(command_shape(event.command_name, command), default=str),
+        )
+
+    def stats(self) -> dict[str, Any]:
+        return {"slow": self.slow, "threshold_ms": self.threshold_ms}
+
+
+@dataclass
+class QueryShape:
+    name: str
+    collection: str
+    filter: dict[str, Any] = field(default_factory=dict)
+    sort: dict[str, int] = field(default_factory=dict)
+    # Explained as an aggregate instead of a find when set.
+    pipeline: list[dict[str, Any]] = field(default_factory=list)
+    allow_collscan: bool = False
+    allow_sort: bool = False
+
+    def command(self) -> dict[str, Any]:
+        if self.pipeline:
+            return {
+                "aggregate": self.collection,
+                "pipeline": self.pipeline,
+                "cursor": {},
+            }
+
+        find: dict[str, Any] = {"find": self.collection, "filter": self.filter}
+        if self.sort:
+            find["sort"] = self.sort
+        return find
+
+    def expected(self, issue: str) -> bool:
+        if issue == "COLLSCAN":
+            return self.allow_collscan
+        return self.allow_sort
+
+
+def router_queries() -> list[QueryShape]:
+    """
+    The queries the logs and pets routers issue, with sample values.
+    """
+    user_id = "audit"
+    object_id = ObjectId()
+    now = datetime.now(timezone.utc)
+    by_id = {"_id": object_id}
+    by_user_id = {"_id": object_id, "user_id": user_id}
+    by_ids = {"_id": {"$in": [object_id]}, "user_id": user_id}
+    since = {"user_id": user_id, "updated_at": {"$gt": now}}
+    legacy_since = {
+        "user_id": user_id,
+        "$or": [
+            {"updated_at": {"$gt": now}},
+            {"updated_at": None, "created_at": {"$gt": now}},
+        ],
+    }
+    dates = {"user_id": user_id, "date": {"$gte": now, "$lt": now}}
+    months = {"user_id": user_id, "month": {"$gte": "2024-01", "$lte": "2024-12"}}
+
+    return [
+        # Lists are not scoped to the user.
+        QueryShape("get_logs", "logs", allow_collscan=True),
+        QueryShape("get_logs?ids", "logs", by_ids),
+        QueryShape("get_logs?start&end", "logs", dates),
+        QueryShape("get_logs?start&end", "log_archives", months),
+        QueryShape(
+            "get_logs?ids",
+            "log_archives",
+            {"log_ids": {"$in": [object_id]}, "user_id": user_id},
+        ),
+        QueryShape("get_logs", "log_archives", {"user_id": user_id}),
+        QueryShape("get_log", "log_archives", {"log_ids": {"$in": [object_id]}}),
+        QueryShape(
+            "update_log / delete_log",
+            "log_archives",
+            {"log_ids": object_id, "user_id": user_id},
+        ),
+        QueryShape(
+            "archive_logs",
+            "logs",
+            {"date": {"$lt": now}, "_id": {"$nin": [object_id]}},
+        ),
+        QueryShape(
+            "archive_logs", "log_archives", {"user_id": user_id, "month": "2024-01"}
+        ),
+        QueryShape("get_log_changes", "logs", legacy_since, {"updated_at": 1}),
+        QueryShape("get_log_changes", "log_tombstones", since, {"updated_at": 1}),
+        QueryShape("get_log_changes", "log_archives", since),
+        # Results are ranked by relevance, which no index can sort by.
+        QueryShape(
+            "search_logs",
+            "logs",
+            pipeline=search_pipeline(
+                {"user_id": user_id}, "sock", (1.0, object_id), 20, {"name": 1}
+            ),
+            allow_sort=True,
+        ),
+        QueryShape("get_log", "logs", by_id),
+        QueryShape("update_log / delete_log", "logs", by_user_id),
+        QueryShape("get_pets", "pets", allow_collscan=True),
+        QueryShape("get_pets?ids", "pets", by_ids),
+        QueryShape("get_pet", "pets", by_id),
+        QueryShape("update_pet / delete_pet", "pets", by_user_id),
+    ]
+
+
+def plan_stages(plan: Any) -> list[str]:
+    """
+    Every stage in an explained plan.
+    """
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages += plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            stages += plan_stages(value)
+
+    return stages
+
+
+def winning_plans(explained: Any) -> list[Any]:
+    """
+    Every winning plan in explain output, which nests them under aggregation
+    stages and shards.
+    """
+    plans = []
+    if isinstance(explained, dict):
+        for key, value in explained.items():
+            if key == "winningPlan":
+                plans.append(value)
+            else:
+                plans += winning_plans(value)
+    elif isinstance(explained, list):
+        for value in explained:
+            plans += winning_plans(value)
+
+    return plans
+
+
+def plan_issues(explained: dict[str, Any]) -> list[str]:
+    """
+    Collection scans and in memory sorts in the winning plans.
+    """
+    stages = plan_stages(winning_plans(explained))
+
+    issues = []
+    if "COLLSCAN" in stages:
+        issues.append("COLLSCAN")
+    if "SORT" in stages:
+        issues.append("unindexed sort")
+
+    return issues
+
+
+async def audit(strict: bool = False) -> bool:
+    """
+    Print the plan issues of every router query and return whether the
+    audit passed.
+    """
+    db = get_db()
+    passed = True
+
+    for query in router_queries():
+        explained = await db.command(
+            {"explain": query.command(), "verbosity": "queryPlanner"}
+        )
+
+        issues = []
+        for issue in plan_issues(explained):
+            if query.expected(issue):
+                issues.append(f"{issue} (expected)")
+            else:
+                issues.append(issue)
+                if strict:
+                    passed = False
+        print(f"{query.collection:<16} {query.name:<26} {', '.join(issues) or 'ok'}")
+
+    for index in await missing_indexes():
+        passed = False
+        print(f"missing index {index}")
+
+    return passed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--strict", action="store_true", help="fail on flagged plans too"
+    )
+    args = parser.parse_args()
+
+    if not asyncio.run(audit(args.strict)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from . import metrics
+
+
+@dataclass(frozen=True)
+class Budget:
+    """
+    Token bucket refilling `rate` tokens per second, holding up to `burst`.
+    """
+
+    rate: float
+    burst: int
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until the bucket is full again.
+    reset: int
+    # Seconds until the next token, when not allowed.
+    retry_after: int
+
+
+class RateLimitBackend(Protocol):
+    """
+    Where bucket state lives. Implement this over a shared store, like
+    Redis, to enforce limits across processes.
+    """
+
+    async def acquire(self, key: str, budget: Budget) -> RateLimitResult: ...
+
+
+class MemoryRateLimitBackend:
+    """
+    Per-process token buckets with bounded state.
+
+    Buckets that have refilled completely behave exactly like new ones, so
+    they are dropped. Past `max_keys`, the least recently used bucket is
+    evicted.
+    """
+
+    def __init__(self, max_keys: int = 10000) -> None:
+        self.max_keys = max_keys
+        # key -> (tokens, updated at, seconds to refill completely)
+        self.buckets: OrderedDict[str, tuple[float, float, float]] = OrderedDict()
+        self.evicted = 0
+
+    async def acquire(self, key: str, budget: Budget) -> RateLimitResult:
+        now = time.monotonic()
+        self.expire(now)
+
+        tokens: float = budget.burst
+        if key in self.buckets:
+            tokens, updated, _ = self.buckets.pop(key)
+            tokens = min(budget.burst, tokens + (now - updated) * budget.rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+
+        self.buckets[key] = (tokens, now, (budget.burst - tokens) / budget.rate)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+            self.evicted += 1
+
+        return RateLimitResult(
+            allowed=allowed,
+            limit=budget.burst,
+            remaining=math.floor(tokens),
+            reset=math.ceil((budget.burst - tokens) / budget.rate),
+            retry_after=0 if allowed else math.ceil((1 - tokens) / budget.rate),
+        )
+
+    def expire(self, now: float) -> None:
+        # Oldest first, stop at the first bucket that is still refilling.
+        while self.buckets:
+            key, (_, updated, refill) = next(iter(self.buckets.items()))
+            if now - updated < refill:
+                break
+            del self.buckets[key]
+
+    def stats(self) -> dict[str, Any]:
+        return {"keys": len(self.buckets), "evicted": self.evicted}
+
+
+class RateLimiter:
+    """
+    Named budgets enforced through a backend.
+    """
+
+    def __init__(self, backend: RateLimitBackend, budgets: dict[str, Budget]) -> None:
+        self.backend = backend
+        self.budgets = budgets
+        self.allowed = 0
+        self.limited = 0
+
+        metrics.register("rate_limit", self.stats)
+
+    async def acquire(self, budget: str, key: str) -> RateLimitResult:
+        result = await self.backend.acquire(f"{budget}:{key}", self.budgets[budget])
+        if result.allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        stats = {"allowed": self.allowed, "limited": self.limited}
+        if isinstance(self.backend, MemoryRateLimitBackend):
+            stats |= self.backend.stats()
+
+        return stats
@@ -0,0 +1,140 @@
+import base64
+import binascii
+import json
+import re
+from typing import TYPE_CHECKING, Any
+
+import bson
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+from app.settings import settings
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorCollection
+
+WORD = re.compile(r"\w+")
+
+
+def encode_cursor(score: float, object_id: ObjectId) -> str:
+    """
+    Cursor pointing just past a result with `score` and `object_id`.
+    """
+    return base64.urlsafe_b64encode(
+        json.dumps([score, str(object_id)]).encode()
+    ).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[float, ObjectId]:
+    """
+    Parse a cursor from `encode_cursor`. Raises a 400 HTTPException when it
+    is not one.
+    """
+    try:
+        score, object_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), ObjectId(object_id)
+    except (ValueError, TypeError, binascii.Error, bson.errors.InvalidId):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor."
+        )
+
+
+def search_pipeline(
+    query: dict[str, Any],
+    search: str,
+    after: tuple[float, ObjectId] | None,
+    limit: int,
+    projection: dict[str, int] | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Aggregation for a page of `text_search`, one more than `limit` to tell
+    whether there is a next page.
+    """
+    pipeline: list[dict[str, Any]] = [
+        {"$match": query | {"$text": {"$search": search}}},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    if after:
+        score, object_id = after
+        pipeline.append(
+            {
+                "$match": {
+                    "$or": [
+                        {"score": {"$lt": score}},
+                        {"score": score, "_id": {"$gt": object_id}},
+                    ]
+                }
+            }
+        )
+    pipeline += [{"$sort": {"score": -1, "_id": 1}}, {"$limit": limit + 1}]
+    if projection:
+        pipeline.append({"$project": projection | {"score": 1}})
+
+    return pipeline
+
+
+async def text_search(
+    collection: "AsyncIOMotorCollection[Any]",
+    query: dict[str, Any],
+    search: str,
+    weights: dict[str, int],
+    cursor: str | None,
+    limit: int,
+    projection: dict[str, int] | None = None,
+    session: "AsyncIOMotorClientSession | None" = None,
+) -> tuple[list[dict[str, Any]], str | None]:
+    """
+    Documents matching `query` and the text `search`, most relevant first.
+
+    Uses the collection's text index, which must cover `weights`. Each
+    document gets its relevance as `score`. Returns a page of up to `limit`
+    documents and the cursor for the next page, if there is one.
+    """
+    after = decode_cursor(cursor) if cursor else None
+
+    if settings.testing:
+        docs = await fallback_text_search(collection, query, search, weights, after)
+    else:
+        pipeline = search_pipeline(query, search, after, limit, projection)
+        docs = await collection.aggregate(pipeline, session=session).to_list(None)
+
+    page = docs[:limit]
+    next_cursor = None
+    if len(docs) > limit:
+        next_cursor = encode_cursor(page[-1]["score"], page[-1]["_id"])
+
+    return page, next_cursor
+
+
+async def fallback_text_search(
+    collection: "AsyncIOMotorCollection[Any]",
+    query: dict[str, Any],
+    search: str,
+    weights: dict[str, int],
+    after: tuple[float, ObjectId] | None,
+) -> list[dict[str, Any]]:
+    """
+    Rank documents in Python for mongomock, which has no `$text`.
+
+    Scores are the weighted count of search words in each field. Phrases,
+    negation and stemming are not supported.
+    """
+    words = {word.lower() for word in WORD.findall(search)}
+
+    docs = []
+    for doc in await collection.find(query).to_list(None):
+        score = 0.0
+        for field, weight in weights.items():
+            for word in WORD.findall(doc.get(field) or ""):
+                if word.lower() in words:
+                    score += weight
+        if score:
+            docs.append(doc | {"score": score})
+
+    docs.sort(key=lambda doc: (-doc["score"], doc["_id"]))
+    if after:
+        docs = [
+            doc for doc in docs if (-doc["score"], doc["_id"]) > (-after[0], after[1])
+        ]
+
+    return docs
@@ -0,0 +1,69 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Hashable, Iterable, TypeVar
+
+from . import metrics
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Share one in-flight call between concurrent callers with the same key.
+
+    The first caller for a key starts the call, callers arriving while it is
+    still running await the same result, or the same exception. Nothing is
+    cached once the call finishes.
+
+    The call runs in a fresh context, so it is not bound by the deadlines
+    of the caller that started it, every caller waits within its own. Only
+    the context variables in `carry` are taken from that caller.
+    """
+
+    def __init__(
+        self, name: str, carry: Iterable[contextvars.ContextVar[Any]] = ()
+    ) -> None:
+        self.carry = tuple(carry)
+        self.in_flight: dict[Hashable, asyncio.Task[Any]] = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+        metrics.register(f"singleflight.{name}", self.stats)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `fn`, or join the call already running for `key`.
+        """
+        self.calls += 1
+
+        task = self.in_flight.get(key)
+        if task is None:
+            context = contextvars.Context()
+            for var in self.carry:
+                context.run(var.set, var.get(None))
+            task = asyncio.get_running_loop().create_task(
+                self.call(fn), context=context
+            )
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.forget(key, task))
+        else:
+            self.deduplicated += 1
+
+        # Shielded so one caller going away does not cancel the others.
+        result: T = await asyncio.shield(task)
+        return result
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        # Awaited here so `fn` itself also runs in the fresh context.
+        return await fn()
+
+    def forget(self, key: Hashable, task: asyncio.Task[Any]) -> None:
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self.in_flight),
+        }
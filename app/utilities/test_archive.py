@@ -0,0 +1,205 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+from bson import ObjectId
+from httpx import AsyncClient
+
+from app.settings import settings
+from app.utilities import archive
+from app.utilities.archive import archive_logs, find_archived_logs_by_ids
+from app.utilities.clients import get_db
+
+pytestmark = pytest.mark.asyncio
+AUTH_HEADER = {"Authorization": f"Bearer {settings.static_token}"}
+
+
+async def test_archive_logs(test_client: AsyncClient) -> None:
+    """
+    Test archiving old logs and reading them back
+    """
+    dates = ["2020-01-05T10:00:00Z", "2020-01-20T10:00:00Z", "2020-02-03T10:00:00Z"]
+    log_ids = []
+    for date in dates:
+        r = await test_client.post(
+            "/v1/logs",
+            json={"name": "old", "type": "pee", "date": date},
+            headers=AUTH_HEADER,
+        )
+        assert r.status_code == 200
+        log_ids.append(r.json().get("id"))
+
+    other = await get_db().logs.insert_one(
+        {"user_id": "other", "name": "old", "type": "pee"}
+        | {"date": datetime(2020, 1, 5), "created_at": datetime(2020, 1, 5)}
+    )
+
+    r = await test_client.get(
+        "/v1/logs", params={"end": "2020-12-31T00:00:00Z"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    before_archive = r.json()
+    assert [log.get("id") for log in before_archive] == log_ids
+
+    archived = await archive_logs(datetime.now(timezone.utc) - timedelta(days=365))
+    assert archived >= 3
+    assert (
+        await get_db().logs.count_documents({"date": {"$lt": datetime(2021, 1, 1)}})
+        == 0
+    )
+    assert (
+        await get_db().log_archives.count_documents(
+            {"user_id": "tester", "month": {"$in": ["2020-01", "2020-02"]}}
+        )
+        == 2
+    )
+
+    # Running again finds nothing left to move
+    assert await archive_logs(datetime.now(timezone.utc) - timedelta(days=365)) == 0
+
+    # Date ranges read archived logs
+    r = await test_client.get(
+        "/v1/logs", params={"end": "2020-12-31T00:00:00Z"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    assert r.json() == before_archive
+
+    r = await test_client.get(
+        "/v1/logs",
+        params={
+            "start": "2020-01-10T00:00:00Z",
+            "end": "2020-02-01T00:00:00Z",
+            "fields": "date",
+        },
+        headers=AUTH_HEADER,
+    )
+    assert r.status_code == 200
+    assert r.headers.get("RateLimit-Remaining")
+    assert r.json() == [{"id": log_ids[1], "date": "2020-01-20T10:00:00"}]
+
+    # So do reads by id
+    r = await test_client.get(f"/v1/logs/{log_ids[0]}", headers=AUTH_HEADER)
+    assert r.status_code == 200
+    assert r.json() == before_archive[0]
+
+    r = await test_client.get(
+        "/v1/logs", params={"ids": ",".join(log_ids[::-1])}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    assert r.json() == before_archive[::-1]
+
+    # Lists without a range include archived logs
+    r = await test_client.get("/v1/logs", headers=AUTH_HEADER)
+    assert r.status_code == 200
+    listed = {log.get("id"): log for log in r.json()}
+    assert [listed.get(log_id) for log_id in log_ids] == before_archive
+    # Other users' archived logs are not read
+    assert str(other.inserted_id) not in listed
+
+    # Archived logs can be updated and deleted
+    r = await test_client.patch(
+        f"/v1/logs/{log_ids[0]}", json={"name": "restored"}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+
+    r = await test_client.get(f"/v1/logs/{log_ids[0]}", headers=AUTH_HEADER)
+    assert r.status_code == 200
+    assert r.json().get("name") == "restored"
+
+    r = await test_client.delete(f"/v1/logs/{log_ids[1]}", headers=AUTH_HEADER)
+    assert r.status_code == 200
+
+    r = await test_client.get(f"/v1/logs/{log_ids[1]}", headers=AUTH_HEADER)
+    assert r.status_code == 404
+
+    r = await test_client.delete(f"/v1/logs/{log_ids[1]}", headers=AUTH_HEADER)
+    assert r.status_code == 404
+
+    # Restored logs are archived again, with their changes
+    await archive_logs(datetime.now(timezone.utc) - timedelta(days=365))
+    archived_logs = await find_archived_logs_by_ids([ObjectId(i) for i in log_ids])
+    assert {doc["name"] for doc in archived_logs} == {"restored", "old"}
+    assert len(archived_logs) == 2
+
+
+async def test_archive_logs_changed(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test logs changed while being archived are taken out of their bucket
+    """
+    db = get_db()
+    date = datetime(2019, 3, 1)
+    now = datetime(2019, 3, 2)
+    changed = await db.logs.insert_one(
+        {"user_id": "changed", "name": "a", "type": "pee", "date": date}
+        | {"created_at": now, "updated_at": now}
+    )
+    deleted = await db.logs.insert_one(
+        {"user_id": "changed", "name": "b", "type": "pee", "date": date}
+        | {"created_at": now, "updated_at": now}
+    )
+
+    # Change both logs right after their bucket is written
+    update_bucket = archive.update_bucket
+
+    async def change_logs(user_id: str, month: str, change: Any) -> None:
+        await update_bucket(user_id, month, change)
+        if await db.logs.count_documents({"_id": deleted.inserted_id}):
+            await db.logs.update_one(
+                {"_id": changed.inserted_id}, {"$set": {"updated_at": datetime.now()}}
+            )
+            await db.logs.delete_one({"_id": deleted.inserted_id})
+
+    monkeypatch.setattr(archive, "update_bucket", change_logs)
+    await archive_logs(datetime(2019, 4, 1))
+
+    assert await db.logs.count_documents({"user_id": "changed"}) == 1
+    assert await db.log_archives.count_documents({"user_id": "changed"}) == 0
+    assert await find_archived_logs_by_ids([deleted.inserted_id]) == []
+
+
+async def test_archived_log_changes(
+    test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Test syncs include archived logs, and changes made right before archiving
+    """
+    monkeypatch.setattr(settings, "changes_lag_ms", 0)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    result = await get_db().logs.insert_one(
+        {"user_id": "tester", "name": "old", "type": "pee"}
+        | {"date": datetime(2018, 6, 1), "created_at": now, "updated_at": now}
+    )
+    log_id = str(result.inserted_id)
+
+    r = await test_client.get("/v1/logs/changes", headers=AUTH_HEADER)
+    assert r.status_code == 200
+    token = r.json().get("token")
+
+    # Changed, then archived before the next sync
+    updated_at = datetime.fromisoformat(token) + timedelta(seconds=1)
+    await get_db().logs.update_one(
+        {"_id": result.inserted_id},
+        {"$set": {"name": "changed", "updated_at": updated_at}},
+    )
+    assert await archive_logs(datetime(2019, 1, 1)) == 1
+
+    r = await test_client.get(
+        "/v1/logs/changes", params={"since": token}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    results = r.json()
+    assert [(log.get("id"), log.get("name")) for log in results.get("logs")] == [
+        (log_id, "changed")
+    ]
+    assert results.get("token") == updated_at.isoformat()
+
+    r = await test_client.get(
+        "/v1/logs/changes", params={"since": results.get("token")}, headers=AUTH_HEADER
+    )
+    assert r.status_code == 200
+    assert r.json().get("logs") == []
+
+    # Full syncs include every archived log
+    r = await test_client.get("/v1/logs/changes", headers=AUTH_HEADER)
+    assert r.status_code == 200
+    assert log_id in [log.get("id") for log in r.json().get("logs")]
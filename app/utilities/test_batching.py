@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import WriteError
+
+from app.utilities.batching import InsertBatcher
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_insert_batcher() -> None:
+    """
+    Test coalescing concurrent inserts
+    """
+    collection = AsyncMongoMockClient()["test"]["batched"]
+    batcher = InsertBatcher(lambda: collection, max_size=3, max_delay_ms=50)
+
+    # Not started, inserts are written directly
+    inserted_id = await batcher.insert({"n": 0})
+    assert await collection.find_one({"_id": inserted_id})
+
+    # Each caller receives its own id
+    batcher.start()
+    inserted_ids = await asyncio.gather(*[batcher.insert({"n": n}) for n in range(7)])
+    assert len(set(inserted_ids)) == 7
+    for n, inserted_id in enumerate(inserted_ids):
+        doc = await collection.find_one({"_id": inserted_id})
+        assert doc and doc["n"] == n
+
+    # Only the failing document raises
+    duplicate_id = inserted_ids[0]
+    results = await asyncio.gather(
+        batcher.insert({"_id": duplicate_id}),
+        batcher.insert({"n": 8}),
+        return_exceptions=True,
+    )
+    assert isinstance(results[0], WriteError)
+    assert await collection.find_one({"_id": results[1]})
+
+    # Callers that give up before the write are dropped
+    cancelled = asyncio.ensure_future(batcher.insert({"n": "cancelled"}))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await batcher.insert({"n": 10})
+    assert not await collection.find_one({"n": "cancelled"})
+
+    # Stopping flushes what is queued
+    pending = asyncio.ensure_future(batcher.insert({"n": 9}))
+    await asyncio.sleep(0)
+    await batcher.stop()
+    assert await collection.find_one({"_id": await pending})
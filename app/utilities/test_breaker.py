@@ -0,0 +1,129 @@
+import asyncio
+from typing import Any
+
+import httpx
+import pytest
+from pymongo.errors import AutoReconnect, DuplicateKeyError
+
+from app.main import app
+from app.routers.pets import pets
+from app.settings import settings
+from app.utilities import data
+from app.utilities.breaker import CircuitBreaker, CircuitOpen
+
+pytestmark = pytest.mark.asyncio
+AUTH_HEADER = {"Authorization": f"Bearer {settings.static_token}"}
+
+
+async def test_circuit_breaker() -> None:
+    """
+    Test opening, half open probing and closing
+    """
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+
+    breaker.before()
+    breaker.failure()
+    breaker.before()
+    breaker.success()
+    assert breaker.state == "closed"
+
+    for _ in range(2):
+        breaker.before()
+        breaker.failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        breaker.before()
+
+    # One probe at a time once the reset timeout passes
+    await asyncio.sleep(0.05)
+    breaker.before()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpen):
+        breaker.before()
+
+    # A failed probe opens the circuit again
+    breaker.failure()
+    assert breaker.state == "open"
+
+    await asyncio.sleep(0.05)
+    breaker.before()
+    breaker.success()
+    assert breaker.stats() == {
+        "state": "closed",
+        "failures": 0,
+        "opened": 2,
+        "rejected": 2,
+    }
+
+
+class FailingCollection:
+    """
+    Stands in for a collection on an unreachable MongoDB.
+    """
+
+    def __init__(self, error: Exception) -> None:
+        self.error = error
+        self.calls = 0
+
+    def find(self, *args: Any, **kwargs: Any) -> "FailingCollection":
+        self.calls += 1
+        return self
+
+    async def to_list(self, length: int | None) -> list[dict[str, Any]]:
+        raise self.error
+
+
+class RepliedCollection:
+    """
+    Stands in for a collection on a reachable MongoDB.
+    """
+
+    def find(self, *args: Any, **kwargs: Any) -> "RepliedCollection":
+        return self
+
+    async def to_list(self, length: int | None) -> list[dict[str, Any]]:
+        data.mongo_replied()
+        return []
+
+
+async def test_mongo_circuit(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test failing fast while MongoDB is down
+    """
+    breaker = CircuitBreaker("test_mongo", failure_threshold=2, reset_timeout=0.05)
+    monkeypatch.setattr(data, "mongo_breaker", breaker)
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+        base_url="http://test",
+    )
+
+    # Errors from the request itself do not count
+    collection = FailingCollection(DuplicateKeyError("duplicate"))
+    monkeypatch.setattr(pets, "get_read_collection", lambda name: collection)
+    for _ in range(3):
+        r = await client.get("/v1/pets", headers=AUTH_HEADER)
+        assert r.status_code == 500
+    assert breaker.state == "closed"
+
+    collection = FailingCollection(AutoReconnect("connection refused"))
+    monkeypatch.setattr(pets, "get_read_collection", lambda name: collection)
+    for _ in range(2):
+        r = await client.get("/v1/pets", headers=AUTH_HEADER)
+        assert r.status_code == 500
+
+    r = await client.get("/v1/pets", headers=AUTH_HEADER)
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"
+    assert collection.calls == 2
+
+    # Probes rejected before reaching MongoDB say nothing about it
+    await asyncio.sleep(0.05)
+    r = await client.get("/v1/pets/invalid", headers=AUTH_HEADER)
+    assert r.status_code == 400
+    assert breaker.state == "half_open"
+
+    # MongoDB is back, the probe closes the circuit
+    monkeypatch.setattr(pets, "get_read_collection", lambda name: RepliedCollection())
+    r = await client.get("/v1/pets", headers=AUTH_HEADER)
+    assert r.status_code == 200
+    assert breaker.state == "closed"
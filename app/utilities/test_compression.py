@@ -0,0 +1,137 @@
+import gzip
+from typing import AsyncIterator
+
+import brotli
+import pytest
+import zstandard
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.utilities.compression import (
+    CompressedCache,
+    CompressionMiddleware,
+    available_compressors,
+    negotiate,
+)
+
+BODY = "poop " * 1000
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+
+@app.get("/large")
+async def large() -> PlainTextResponse:
+    return PlainTextResponse(BODY)
+
+
+@app.get("/small")
+async def small() -> PlainTextResponse:
+    return PlainTextResponse("poop")
+
+
+@app.get("/stream")
+async def stream() -> StreamingResponse:
+    async def chunks() -> AsyncIterator[str]:
+        for _ in range(10):
+            yield "poop " * 100
+
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+def test_negotiate() -> None:
+    """
+    Test picking a content coding
+    """
+    supported = ["zstd", "br", "gzip"]
+    assert negotiate("gzip, deflate, br, zstd", supported) == "zstd"
+    assert negotiate("gzip;q=1.0, br;q=0.5", supported) == "gzip"
+    assert negotiate("br;q=0, gzip;q=0.1", supported) == "gzip"
+    assert negotiate("*", supported) == "zstd"
+    assert negotiate("identity", supported) is None
+    assert negotiate("", supported) is None
+
+
+@pytest.mark.asyncio
+async def test_compression() -> None:
+    """
+    Test compressing responses
+    """
+    client = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+    # Large responses are compressed
+    r = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert r.headers["Vary"] == "Accept-Encoding"
+    assert int(r.headers["Content-Length"]) < len(BODY)
+    assert r.text == BODY
+
+    # Small responses are not
+    r = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in r.headers
+    assert r.text == "poop"
+
+    # Nothing accepted
+    r = await client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in r.headers
+    assert r.text == BODY
+
+    # Streaming responses are compressed chunk by chunk
+    r = await client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in r.headers
+    assert r.text == "poop " * 1000
+
+
+@pytest.mark.asyncio
+async def test_compression_encodings() -> None:
+    """
+    Test brotli and zstd
+    """
+    client = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+    async with client.stream("GET", "/large", headers={"Accept-Encoding": "br"}) as r:
+        assert r.headers["Content-Encoding"] == "br"
+        raw = b"".join([chunk async for chunk in r.aiter_raw()])
+    assert brotli.decompress(raw) == BODY.encode()
+
+    async with client.stream("GET", "/large", headers={"Accept-Encoding": "zstd"}) as r:
+        assert r.headers["Content-Encoding"] == "zstd"
+        raw = b"".join([chunk async for chunk in r.aiter_raw()])
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(raw) == (
+        BODY.encode()
+    )
+
+    async with client.stream(
+        "GET", "/stream", headers={"Accept-Encoding": "zstd"}
+    ) as r:
+        raw = b"".join([chunk async for chunk in r.aiter_raw()])
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(raw) == (
+        ("poop " * 1000).encode()
+    )
+
+
+def test_compressed_cache() -> None:
+    """
+    Test reusing compressed bodies
+    """
+    cache = CompressedCache(1, available_compressors())
+
+    compressed = cache.get("gzip", BODY.encode())
+    assert gzip.decompress(compressed) == BODY.encode()
+    assert cache.get("gzip", BODY.encode()) is compressed
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Least recently used bodies are evicted
+    cache.get("gzip", b"other")
+    cache.get("gzip", BODY.encode())
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    # Bodies are evicted to stay within the byte budget
+    compressed = cache.get("gzip", BODY.encode())
+    cache = CompressedCache(10, available_compressors(), len(compressed) + 10)
+    cache.get("gzip", BODY.encode())
+    other = cache.get("gzip", b"other")
+    assert list(cache.entries.values()) == [other]
+    assert cache.bytes == len(other)
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.utilities.concurrency import AdaptiveLimiter, ConcurrencyLimitMiddleware
+
+release = asyncio.Event()
+
+app = FastAPI()
+limited_app = ConcurrencyLimitMiddleware(
+    app,
+    initial_limit=3,
+    reserve=0.34,
+    verified=lambda token: token == "verified",
+)
+
+
+@app.get("/slow")
+async def slow() -> dict[str, bool]:
+    await release.wait()
+    return {"success": True}
+
+
+@app.post("/slow")
+async def slow_write() -> dict[str, bool]:
+    await release.wait()
+    return {"success": True}
+
+
+@app.get("/unavailable")
+async def unavailable() -> JSONResponse:
+    return JSONResponse({"detail": "Service unavailable."}, status_code=503)
+
+
+def test_adaptive_limiter() -> None:
+    """
+    Test adjusting the limit
+    """
+    limiter = AdaptiveLimiter(
+        initial_limit=4, min_limit=2, max_limit=5, target_latency=0.1, reserve=0.5
+    )
+
+    # Low priority only gets half
+    assert limiter.try_acquire(priority=False)
+    assert limiter.try_acquire(priority=False)
+    assert not limiter.try_acquire(priority=False)
+    assert limiter.try_acquire(priority=True)
+    assert limiter.try_acquire(priority=True)
+    assert not limiter.try_acquire(priority=True)
+
+    # Fast responses grow the limit while it is in use
+    for _ in range(4):
+        limiter.release(0.01)
+    assert limiter.limit > 4
+
+    # But not while mostly idle
+    limit = limiter.limit
+    for _ in range(20):
+        assert limiter.try_acquire(priority=True)
+        limiter.release(0.01)
+    assert limiter.limit == limit
+
+    # Up to the max
+    for _ in range(20):
+        for _ in range(4):
+            limiter.try_acquire(priority=True)
+        for _ in range(limiter.in_flight):
+            limiter.release(0.01)
+    assert limiter.limit == 5
+
+    # Routes are judged against their usual latency
+    for _ in range(20):
+        limiter.last_decrease = 0
+        assert limiter.try_acquire(priority=True)
+        limiter.release(0.5, route="/v1/auth/login")
+    assert limiter.limit == 5
+
+    limiter.last_decrease = 0
+    assert limiter.try_acquire(priority=True)
+    limiter.release(2, route="/v1/auth/login")
+    assert limiter.limit == 4.5
+
+    # Slow responses shrink it down to the min
+    for _ in range(20):
+        limiter.last_decrease = 0
+        assert limiter.try_acquire(priority=True)
+        limiter.release(1)
+    assert limiter.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_middleware() -> None:
+    """
+    Test shedding requests over the limit
+    """
+    client = AsyncClient(
+        transport=ASGITransport(app=limited_app), base_url="http://test"
+    )
+
+    # Anonymous reads fill their share
+    first = asyncio.ensure_future(client.get("/slow"))
+    await asyncio.sleep(0.01)
+
+    r = await client.get("/slow")
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"
+
+    # Unverified tokens and anonymous writes are low priority
+    r = await client.get("/slow", headers={"Authorization": "Bearer fake"})
+    assert r.status_code == 503
+    r = await client.post("/slow")
+    assert r.status_code == 503
+
+    # Verified reads and writes still get in
+    second = asyncio.ensure_future(
+        client.get("/slow", headers={"Authorization": "Bearer verified"})
+    )
+    third = asyncio.ensure_future(
+        client.post("/slow", headers={"Authorization": "Bearer verified"})
+    )
+    await asyncio.sleep(0.01)
+
+    release.set()
+    assert (await first).status_code == 200
+    assert (await second).status_code == 200
+    assert (await third).status_code == 200
+
+    # 503s from failing dependencies are not overload
+    limit = limited_app.limiter.limit
+    for _ in range(3):
+        r = await client.get("/unavailable")
+        assert r.status_code == 503
+    assert limited_app.limiter.limit >= limit
+    assert set(limited_app.limiter.baselines) == {"/slow", "/unavailable"}
@@ -0,0 +1,216 @@
+import asyncio
+from typing import Any
+
+import pytest
+from bson import Timestamp
+from httpx import AsyncClient
+from pymongo.errors import (
+    ExecutionTimeout,
+    OperationFailure,
+    ServerSelectionTimeoutError,
+)
+
+from app.routers.pets import pets
+from app.settings import settings
+from app.utilities import data
+from app.utilities.data import (
+    causal_session,
+    causal_time,
+    causal_times,
+    get_read_collection,
+    get_write_collection,
+    mongo_breaker,
+    mongo_failed,
+    remember,
+)
+
+
+def test_collections(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test read and write routing
+    """
+    assert get_read_collection("logs").read_preference.mongos_mode == "primary"
+
+    monkeypatch.setattr(settings, "read_preference", "secondaryPreferred")
+    get_read_collection.cache_clear()
+    try:
+        read_preference = get_read_collection("logs").read_preference
+    finally:
+        get_read_collection.cache_clear()
+    assert read_preference.mongos_mode == "secondaryPreferred"
+    assert read_preference.max_staleness == 90
+
+    assert get_write_collection("logs", "add_log").name == "logs"
+
+
+def test_remember() -> None:
+    """
+    Test keeping the latest causal times per user
+    """
+    causal_times.clear()
+
+    remember(["a", None], {"clusterTime": Timestamp(2, 0)}, Timestamp(2, 0))
+    assert causal_times["a"][1] == Timestamp(2, 0)
+    assert None not in causal_times
+
+    # Older times never replace newer ones
+    remember(["a"], {"clusterTime": Timestamp(1, 0)}, Timestamp(1, 0))
+    assert causal_times["a"][1] == Timestamp(2, 0)
+
+    remember(["a"], {"clusterTime": Timestamp(3, 0)}, Timestamp(3, 0))
+    assert causal_times["a"][1] == Timestamp(3, 0)
+
+    # Least recently written users are dropped
+    size = data.CAUSAL_TIMES_SIZE
+    data.CAUSAL_TIMES_SIZE = 2
+    try:
+        remember(["b"], {}, Timestamp(1, 0))
+        remember(["c"], {}, Timestamp(1, 0))
+        assert list(causal_times) == ["b", "c"]
+    finally:
+        data.CAUSAL_TIMES_SIZE = size
+        causal_times.clear()
+
+
+class StubSession:
+    def __init__(self) -> None:
+        self.cluster_time: Any = None
+        self.operation_time: Any = None
+
+    def advance_cluster_time(self, cluster_time: Any) -> None:
+        self.cluster_time = cluster_time
+
+    def advance_operation_time(self, operation_time: Any) -> None:
+        self.operation_time = operation_time
+
+    async def __aenter__(self) -> "StubSession":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        pass
+
+
+class StubClient:
+    def __init__(self) -> None:
+        self.sessions: list[StubSession] = []
+
+    async def start_session(self, causal_consistency: bool) -> StubSession:
+        assert causal_consistency
+        self.sessions.append(StubSession())
+        return self.sessions[-1]
+
+
+@pytest.mark.asyncio
+async def test_causal_session(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test sessions start from and remember the users' causal times
+    """
+    client = StubClient()
+    monkeypatch.setattr(settings, "testing", False)
+    monkeypatch.setattr(data, "get_db", lambda: type("Db", (), {"client": client}))
+    causal_times.clear()
+
+    try:
+        # New users start from nothing
+        async with causal_session("a", None) as session:
+            assert session is not None
+            assert session is client.sessions[0]
+            assert session.operation_time is None
+            session.advance_cluster_time({"clusterTime": Timestamp(2, 0)})
+            session.advance_operation_time(Timestamp(2, 0))
+        assert causal_time("a") == Timestamp(2, 0)
+        assert causal_time(None) is None
+
+        # Later sessions have seen their writes
+        async with causal_session("a", "b") as session:
+            assert session is not None
+            assert session.cluster_time == {"clusterTime": Timestamp(2, 0)}
+            assert session.operation_time == Timestamp(2, 0)
+            session.advance_operation_time(Timestamp(3, 0))
+        assert causal_time("a") == causal_time("b") == Timestamp(3, 0)
+    finally:
+        causal_times.clear()
+
+
+def test_mongo_failed() -> None:
+    """
+    Test only unreachable or slow MongoDB counts as a failure
+    """
+    assert mongo_failed(ServerSelectionTimeoutError("no primary"))
+    assert mongo_failed(ExecutionTimeout("operation exceeded time limit", 50))
+    assert not mongo_failed(OperationFailure("duplicate key", 11000))
+    assert not mongo_failed(asyncio.CancelledError())
+    assert not mongo_failed(TimeoutError())
+
+
+class SlowCursor:
+    async def to_list(self, length: int | None) -> list[Any]:
+        await asyncio.sleep(0.1)
+        return []
+
+
+class SlowCollection:
+    def find(self, *args: Any, **kwargs: Any) -> SlowCursor:
+        return SlowCursor()
+
+
+@pytest.mark.asyncio
+async def test_mongo_circuit_client_deadline(
+    test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Test client deadlines never open the MongoDB circuit
+    """
+    monkeypatch.setattr(pets, "get_read_collection", lambda name: SlowCollection())
+    headers = {
+        "Authorization": f"Bearer {settings.static_token}",
+        "X-Timeout-Ms": "1",
+    }
+
+    for _ in range(mongo_breaker.failure_threshold + 1):
+        r = await test_client.get("/v1/pets", headers=headers)
+        assert r.status_code == 504
+    assert mongo_breaker.state == "closed"
+    assert mongo_breaker.failures == 0
+
+
+class HungCollection:
+    def __init__(self) -> None:
+        self.released = asyncio.Event()
+
+    def find(self, *args: Any, **kwargs: Any) -> "HungCollection":
+        return self
+
+    async def to_list(self, length: int | None) -> list[Any]:
+        await self.released.wait()
+        return []
+
+
+@pytest.mark.asyncio
+async def test_mongo_circuit_server_deadline(
+    test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Test running out of the server's deadline opens the MongoDB circuit
+    """
+    collection = HungCollection()
+    monkeypatch.setattr(pets, "get_read_collection", lambda name: collection)
+    monkeypatch.setattr(settings, "deadline_ms", 20)
+    headers = {"Authorization": f"Bearer {settings.static_token}"}
+
+    # Every request waiting on the shared read runs out of its own time
+    try:
+        for _ in range(mongo_breaker.failure_threshold):
+            r = await test_client.get(
+                "/v1/pets", params={"fields": "name"}, headers=headers
+            )
+            assert r.status_code == 504
+
+        r = await test_client.get(
+            "/v1/pets", params={"fields": "name"}, headers=headers
+        )
+        assert r.status_code == 503
+        assert mongo_breaker.state == "open"
+    finally:
+        collection.released.set()
+        mongo_breaker.success()
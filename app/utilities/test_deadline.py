@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import APIRouter, FastAPI
+from pymongo.errors import ExecutionTimeout, OperationFailure
+
+from app.main import deadline_exceeded_handler
+from app.settings import settings
+from app.utilities.concurrency import ConcurrencyLimitMiddleware
+from app.utilities.deadline import (
+    DeadlineExceeded,
+    DeadlineRoute,
+    is_timeout,
+    remaining,
+    route_timeout,
+)
+
+pytestmark = pytest.mark.asyncio
+
+router = APIRouter(route_class=DeadlineRoute)
+
+
+@router.get("/sleep")
+async def sleep(seconds: float) -> float | None:
+    await asyncio.sleep(seconds)
+    return remaining()
+
+
+slow_app = FastAPI()
+slow_app.include_router(router)
+slow_app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)  # type: ignore[arg-type]
+
+
+async def test_deadline() -> None:
+    """
+    Test requests fail fast once their deadline passes
+    """
+    client = httpx.AsyncClient(app=slow_app, base_url="http://test")
+
+    r = await client.get("/sleep", params={"seconds": 0})
+    assert r.status_code == 200
+    assert 0 < r.json() <= 10
+
+    r = await client.get(
+        "/sleep", params={"seconds": 5}, headers={"X-Timeout-Ms": "20"}
+    )
+    assert r.status_code == 504
+    assert r.json() == {"detail": "Deadline exceeded."}
+    assert DeadlineRoute.exceeded >= 1
+
+
+async def test_route_timeout() -> None:
+    """
+    Test the timeout header can only shorten a route's deadline
+    """
+    assert route_timeout("login", {}) == (5, False)
+    assert route_timeout("get_logs", {}) == (10, False)
+    assert route_timeout("get_logs", {"X-Timeout-Ms": "250"}) == (0.25, True)
+    assert route_timeout("login", {"X-Timeout-Ms": "60000"}) == (5, False)
+    assert route_timeout("login", {"X-Timeout-Ms": "soon"}) == (5, False)
+    assert remaining(3) == 3
+
+
+async def test_is_timeout() -> None:
+    """
+    Test recognizing dependency timeouts
+    """
+    assert is_timeout(TimeoutError())
+    assert is_timeout(httpx.ReadTimeout("slow"))
+    assert is_timeout(ExecutionTimeout("operation exceeded time limit", 50))
+    assert not is_timeout(OperationFailure("duplicate key", 11000))
+    assert not is_timeout(httpx.ConnectError("refused"))
+
+
+async def test_client_deadline(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test deadlines shortened by the client do not shrink the concurrency limit
+    """
+    limited_app = ConcurrencyLimitMiddleware(slow_app, initial_limit=20)
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=limited_app), base_url="http://test"
+    )
+
+    r = await client.get("/sleep", params={"seconds": 1}, headers={"X-Timeout-Ms": "1"})
+    assert r.status_code == 504
+    assert limited_app.limiter.limit == 20
+
+    # Running out of the server's own budget does
+    monkeypatch.setattr(settings, "deadline_ms", 1)
+    r = await client.get("/sleep", params={"seconds": 1})
+    assert r.status_code == 504
+    assert limited_app.limiter.limit < 20
@@ -0,0 +1,140 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from app.utilities.indexes import create_indexes, missing_indexes
+from app.utilities.query_audit import (
+    SlowCommandLogger,
+    command_shape,
+    plan_issues,
+    router_queries,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_slow_commands(caplog: pytest.LogCaptureFixture) -> None:
+    """
+    Test logging slow commands with their query shape
+    """
+    slow_commands = SlowCommandLogger(threshold_ms=100)
+
+    for request_id, duration_micros in [(1, 5000), (2, 250000)]:
+        event = SimpleNamespace(
+            command_name="find",
+            command={
+                "find": "logs",
+                "filter": {"user_id": "tester", "updated_at": {"$gt": 1}},
+                "sort": {"updated_at": 1},
+            },
+            database_name="poopyrus",
+            request_id=request_id,
+            connection_id=("localhost", 27017),
+            duration_micros=duration_micros,
+        )
+        slow_commands.started(event)  # type: ignore[arg-type]
+        with caplog.at_level(logging.WARNING, logger="poopyrus"):
+            slow_commands.succeeded(event)  # type: ignore[arg-type]
+
+    assert slow_commands.stats()["slow"] == 1
+    assert len(caplog.records) == 1
+    assert caplog.records[0].getMessage() == (
+        "SlowCommand=find Collection=logs Duration=250.0ms Shape="
+        '{"filter": {"user_id": 1, "updated_at": {"$gt": 1}}, '
+        '"sort": {"updated_at": 1}}'
+    )
+    assert not slow_commands.commands
+
+
+async def test_command_shape() -> None:
+    """
+    Test query shapes of writes and aggregations
+    """
+    assert command_shape(
+        "update", {"updates": [{"q": {"_id": 1, "user_id": "a"}, "u": {}}]}
+    ) == {"filter": [{"_id": 1, "user_id": 1}]}
+    assert command_shape(
+        "aggregate",
+        {"pipeline": [{"$match": {"$or": [{"a": 1}, {"b": {"$in": [1, 2]}}]}}]},
+    ) == {"pipeline": [{"$match": {"$or": [{"a": 1}, {"b": {"$in": 1}}]}}]}
+
+
+async def test_plan_issues() -> None:
+    """
+    Test flagging collection scans and in memory sorts
+    """
+    assert plan_issues(
+        {
+            "queryPlanner": {
+                "winningPlan": {
+                    "stage": "SORT",
+                    "inputStage": {"stage": "COLLSCAN"},
+                }
+            }
+        }
+    ) == ["COLLSCAN", "unindexed sort"]
+    assert (
+        plan_issues(
+            {
+                "queryPlanner": {
+                    "winningPlan": {
+                        "queryPlan": {
+                            "stage": "FETCH",
+                            "inputStage": {"stage": "IXSCAN"},
+                        }
+                    }
+                }
+            }
+        )
+        == []
+    )
+
+    # Aggregations nest the plan under their first stage
+    assert plan_issues(
+        {
+            "stages": [
+                {
+                    "$cursor": {
+                        "queryPlanner": {
+                            "winningPlan": {
+                                "stage": "SORT",
+                                "inputStage": {"stage": "TEXT_MATCH"},
+                            }
+                        }
+                    }
+                },
+                {"$sort": {"sortKey": {"score": {"$meta": "textScore"}}}},
+            ]
+        }
+    ) == ["unindexed sort"]
+
+
+async def test_router_queries() -> None:
+    """
+    Test explaining the commands the routers run
+    """
+    queries = {(query.name, query.collection): query for query in router_queries()}
+
+    get_logs = queries[("get_logs", "logs")]
+    assert get_logs.command() == {"find": "logs", "filter": {}}
+    assert get_logs.expected("COLLSCAN")
+    assert not get_logs.expected("unindexed sort")
+
+    archive_logs = queries[("archive_logs", "logs")]
+    assert not archive_logs.expected("COLLSCAN")
+
+    search_logs = queries[("search_logs", "logs")]
+    command = search_logs.command()
+    assert command["aggregate"] == "logs"
+    assert "$text" in command["pipeline"][0]["$match"]
+    assert not search_logs.expected("COLLSCAN")
+    assert search_logs.expected("unindexed sort")
+
+
+async def test_expected_indexes() -> None:
+    """
+    Test every expected index is created
+    """
+    await create_indexes()
+    assert await missing_indexes() == []
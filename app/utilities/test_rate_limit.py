@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+from app.utilities.rate_limit import Budget, MemoryRateLimitBackend
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_memory_rate_limit_backend() -> None:
+    """
+    Test token buckets
+    """
+    backend = MemoryRateLimitBackend(max_keys=2)
+    budget = Budget(rate=1, burst=3)
+
+    # Burst is allowed, then limited
+    for remaining in [2, 1, 0]:
+        result = await backend.acquire("a", budget)
+        assert result.allowed
+        assert result.remaining == remaining
+
+    result = await backend.acquire("a", budget)
+    assert not result.allowed
+    assert result.retry_after == 1
+    assert result.reset == 3
+
+    # Keys are independent
+    assert (await backend.acquire("b", budget)).allowed
+
+    # Tokens refill over time
+    tokens, updated, refill = backend.buckets["a"]
+    backend.buckets["a"] = (tokens, updated - 1.5, refill)
+    assert (await backend.acquire("a", budget)).allowed
+
+    # Least recently used keys are evicted past max keys
+    await backend.acquire("c", budget)
+    assert list(backend.buckets) == ["a", "c"]
+    assert backend.evicted == 1
+
+    # Full buckets expire
+    for key, (tokens, _, refill) in backend.buckets.items():
+        backend.buckets[key] = (tokens, time.monotonic() - refill, refill)
+    await backend.acquire("d", budget)
+    assert list(backend.buckets) == ["d"]
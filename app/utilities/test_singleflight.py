@@ -0,0 +1,69 @@
+import asyncio
+from contextvars import ContextVar
+
+import pytest
+
+from app.utilities.singleflight import SingleFlight
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_single_flight() -> None:
+    """
+    Test sharing concurrent calls
+    """
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        call = calls
+        await asyncio.sleep(0.01)
+        return call
+
+    # Same key shares one call
+    results = await asyncio.gather(*[flight.do("a", fetch) for _ in range(5)])
+    assert results == [1, 1, 1, 1, 1]
+    assert flight.stats() == {"calls": 5, "deduplicated": 4, "in_flight": 0}
+
+    # Different keys run separately
+    a, b = await asyncio.gather(flight.do("a", fetch), flight.do("b", fetch))
+    assert sorted([a, b]) == [2, 3]
+
+    # Finished calls are not cached
+    assert await flight.do("a", fetch) == 4
+
+
+async def test_single_flight_errors() -> None:
+    """
+    Test errors reach every waiter
+    """
+    flight = SingleFlight("test")
+
+    async def fail() -> None:
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    results = await asyncio.gather(
+        *[flight.do("a", fail) for _ in range(3)], return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["deduplicated"] == 2
+
+
+async def test_single_flight_context() -> None:
+    """
+    Test shared calls only keep the carried context of their first caller
+    """
+    carried: ContextVar[str | None] = ContextVar("carried", default=None)
+    dropped: ContextVar[str | None] = ContextVar("dropped", default=None)
+    flight = SingleFlight("test", carry=[carried])
+
+    async def read() -> tuple[str | None, str | None]:
+        await asyncio.sleep(0)
+        return carried.get(), dropped.get()
+
+    carried.set("trace")
+    dropped.set("deadline")
+    assert await flight.do("a", read) == ("trace", None)
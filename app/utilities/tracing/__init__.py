@@ -0,0 +1,257 @@
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import IO, Any, Callable, Iterator, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.settings import settings
+from app.utilities.log import logger
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start: float
+    end: float | None = None
+    error: str | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict[str, Any]:
+        duration_ms = None
+        if self.end is not None:
+            duration_ms = round((self.end - self.start) * 1000, 3)
+
+        return asdict(self) | {"duration_ms": duration_ms}
+
+
+# The span of whatever the current task or thread is doing.
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class SpanExporter(Protocol):
+    """
+    Where finished spans go. Exporters are called from request handlers and
+    driver threads, so they should be quick and thread safe.
+    """
+
+    def export(self, span: Span) -> None: ...
+
+
+class ConsoleExporter:
+    """
+    Write spans to stdout as JSON lines.
+    """
+
+    def __init__(self, stream: IO[str] | None = None) -> None:
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self.lock:
+            print(line, file=self.stream or sys.stdout, flush=True)
+
+
+class FileExporter:
+    """
+    Append spans to a file as JSON lines.
+
+    Like a `logging` QueueHandler, `export` only queues the line. A
+    background thread keeps the file open and writes queued lines, so
+    request handlers never wait on the disk.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.queue: queue.Queue[str | None] = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+
+    def export(self, span: Span) -> None:
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(
+                        target=self.write, name="trace-file-exporter", daemon=True
+                    )
+                    self.thread.start()
+
+        self.queue.put(json.dumps(span.to_dict(), default=str))
+
+    def write(self) -> None:
+        with open(self.path, "a") as file:
+            while True:
+                line = self.queue.get()
+                try:
+                    if line is None:
+                        return
+                    file.write(line + "\n")
+                    if self.queue.empty():
+                        file.flush()
+                finally:
+                    self.queue.task_done()
+
+    def flush(self) -> None:
+        """
+        Wait until every queued span is written.
+        """
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self) -> None:
+        """
+        Write queued spans and close the file.
+        """
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join()
+
+
+EXPORTERS: dict[str, Callable[[], SpanExporter]] = {
+    "console": ConsoleExporter,
+    "file": lambda: FileExporter(settings.tracing_file),
+}
+
+
+class Tracer:
+    """
+    Creates spans and hands them to the exporters once they end.
+    """
+
+    def __init__(self, exporters: list[SpanExporter]) -> None:
+        self.exporters = exporters
+
+    def start_span(
+        self,
+        name: str,
+        parent: Span | None = None,
+        remote_parent: tuple[str, str] | None = None,
+        attributes: dict[str, Any] | None = None,
+    ) -> Span:
+        """
+        Start a span under `parent`, or under a `(trace id, span id)` from
+        another service, without making it the current span.
+        """
+        trace_id, parent_id = os.urandom(16).hex(), None
+        if parent:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        elif remote_parent:
+            trace_id, parent_id = remote_parent
+
+        return Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=os.urandom(8).hex(),
+            parent_id=parent_id,
+            start=time.time(),
+            attributes=attributes or {},
+        )
+
+    def close(self) -> None:
+        """
+        Close exporters that hold on to resources, like files.
+        """
+        for exporter in self.exporters:
+            close = getattr(exporter, "close", None)
+            if close:
+                close()
+
+    def end_span(self, span: Span, error: str | None = None) -> None:
+        span.end = time.time()
+        span.error = error
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception:
+                logger.exception("Failed to export span %s", span.name)
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        remote_parent: tuple[str, str] | None = None,
+        attributes: dict[str, Any] | None = None,
+    ) -> Iterator[Span]:
+        """
+        Run a block in a child of the current span.
+        """
+        span = self.start_span(name, current_span.get(), remote_parent, attributes)
+        token = current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            current_span.reset(token)
+            self.end_span(span, error)
+
+
+tracer = Tracer([EXPORTERS[name]() for name in settings.tracing_exporters])
+
+
+def parse_traceparent(header: str | None) -> tuple[str, str] | None:
+    """
+    The `(trace id, parent span id)` of a W3C traceparent header, or None
+    if it is missing or invalid.
+    """
+    match = TRACEPARENT.match(header or "")
+    if not match:
+        return None
+
+    trace_id, parent_id = match.groups()
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+
+    return trace_id, parent_id
+
+
+class TracingMiddleware:
+    """
+    Trace every request, continuing the caller's trace when it sends a
+    traceparent header. The trace id is returned in `X-Trace-Id`.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        remote_parent = parse_traceparent(Headers(scope=scope).get("traceparent"))
+        with tracer.span(
+            f"{scope['method']} {scope['path']}",
+            remote_parent,
+            {"http.method": scope["method"], "http.target": scope["path"]},
+        ) as span:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.attributes["http.status_code"] = message["status"]
+                    MutableHeaders(scope=message).append("X-Trace-Id", span.trace_id)
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
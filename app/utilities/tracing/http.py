@@ -0,0 +1,35 @@
+import httpx
+
+from . import Tracer, tracer
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """
+    Span for each outbound request, propagated with a traceparent header.
+
+    The span ends once the response headers arrive. Query strings are left
+    out of the recorded URL since they can carry API keys.
+    """
+
+    def __init__(
+        self, transport: httpx.AsyncBaseTransport, tracer: Tracer = tracer
+    ) -> None:
+        self.transport = transport
+        self.tracer = tracer
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with self.tracer.span(
+            f"http.{request.method}",
+            attributes={
+                "http.method": request.method,
+                "http.url": str(request.url.copy_with(query=None)),
+            },
+        ) as span:
+            request.headers["traceparent"] = span.traceparent
+            response = await self.transport.handle_async_request(request)
+            span.attributes["http.status_code"] = response.status_code
+
+            return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -0,0 +1,45 @@
+from typing import Any
+
+from pymongo import monitoring
+
+from . import Span, Tracer, current_span, tracer
+
+
+class CommandTracer(monitoring.CommandListener):
+    """
+    Span for each MongoDB command run while handling a traced request.
+
+    Motor runs commands in threads that copy the caller's context, so the
+    request span is still current when a command starts.
+    """
+
+    def __init__(self, tracer: Tracer = tracer) -> None:
+        self.tracer = tracer
+        self.spans: dict[tuple[int, Any], Span] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        parent = current_span.get()
+        if parent is None:
+            return
+
+        collection = event.command.get(event.command_name)
+        self.spans[(event.request_id, event.connection_id)] = self.tracer.start_span(
+            f"mongo.{event.command_name}",
+            parent,
+            attributes={
+                "db.system": "mongodb",
+                "db.name": event.database_name,
+                "db.operation": event.command_name,
+                "db.collection": collection if isinstance(collection, str) else None,
+            },
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        span = self.spans.pop((event.request_id, event.connection_id), None)
+        if span:
+            self.tracer.end_span(span)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        span = self.spans.pop((event.request_id, event.connection_id), None)
+        if span:
+            self.tracer.end_span(span, error=repr(event.failure))
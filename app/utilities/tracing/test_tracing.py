@@ -0,0 +1,118 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from app.settings import settings
+
+from . import FileExporter, Span, Tracer, parse_traceparent, tracer
+from .http import TracingTransport
+from .mongo import CommandTracer
+
+AUTH_HEADER = {"Authorization": f"Bearer {settings.static_token}"}
+
+
+class RecordingExporter:
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+
+@pytest.mark.asyncio
+async def test_request_spans(test_client: AsyncClient) -> None:
+    """
+    Test requests continue the caller's trace
+    """
+    exporter = RecordingExporter()
+    tracer.exporters.append(exporter)
+    try:
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        r = await test_client.get(
+            "/v1/pets",
+            headers=AUTH_HEADER | {"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"},
+        )
+        assert r.status_code == 200
+        assert r.headers.get("X-Trace-Id") == trace_id
+
+        r = await test_client.get(
+            "/v1/pets", headers=AUTH_HEADER | {"traceparent": "invalid"}
+        )
+        assert r.headers.get("X-Trace-Id") != trace_id
+    finally:
+        tracer.exporters.remove(exporter)
+
+    first, second = exporter.spans
+    assert first.name == "GET /v1/pets"
+    assert first.trace_id == trace_id
+    assert first.parent_id == "00f067aa0ba902b7"
+    assert first.attributes["http.status_code"] == 200
+    assert second.parent_id is None
+
+
+@pytest.mark.asyncio
+async def test_client_spans(tmp_path: Path) -> None:
+    """
+    Test Mongo commands and outbound requests are child spans
+    """
+    path = tmp_path / "traces.jsonl"
+    exporter = FileExporter(str(path))
+    test_tracer = Tracer([exporter])
+
+    commands = CommandTracer(test_tracer)
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200)
+
+    client = httpx.AsyncClient(
+        transport=TracingTransport(httpx.MockTransport(handler), test_tracer)
+    )
+
+    with test_tracer.span("request") as parent:
+        event = SimpleNamespace(
+            command_name="find",
+            command={"find": "logs"},
+            database_name="poopyrus",
+            request_id=1,
+            connection_id=("localhost", 27017),
+        )
+        commands.started(event)  # type: ignore[arg-type]
+        commands.succeeded(event)  # type: ignore[arg-type]
+
+        await client.get("https://example.com/login?key=secret")
+
+    exporter.flush()
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [span["name"] for span in spans] == ["mongo.find", "http.GET", "request"]
+    assert spans[0]["parent_id"] == parent.span_id
+    assert spans[0]["attributes"]["db.collection"] == "logs"
+    assert spans[1]["parent_id"] == parent.span_id
+    assert spans[1]["attributes"]["http.url"] == "https://example.com/login"
+    assert requests[0].headers["traceparent"] == (
+        f"00-{parent.trace_id}-{spans[1]['span_id']}-01"
+    )
+    assert spans[2]["duration_ms"] >= 0
+
+    # Spans queued before closing are still written
+    with test_tracer.span("last"):
+        pass
+    test_tracer.close()
+    assert json.loads(path.read_text().splitlines()[-1])["name"] == "last"
+
+
+def test_parse_traceparent() -> None:
+    """
+    Test parsing W3C traceparent headers
+    """
+    assert parse_traceparent(
+        "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    ) == ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7")
+    assert parse_traceparent(None) is None
+    assert parse_traceparent("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa") is None
+    assert parse_traceparent(f"00-{'0' * 32}-00f067aa0ba902b7-01") is None
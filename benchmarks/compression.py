@@ -0,0 +1,94 @@
+"""
+Compare bytes saved against CPU spent compressing log list responses.
+
+Builds `GET /v1/logs` style JSON bodies of several sizes and compresses
+each with every available encoder, cold and through the compressed cache.
+
+    $ uv run python -m benchmarks.compression
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from app.utilities.compression import CompressedCache, available_compressors
+
+NOTES = [
+    None,
+    None,
+    "Good boy!",
+    "Went right after breakfast.",
+    "Ate something in the yard again, keep an eye on him.",
+    "Vet said to track consistency for the next two weeks, this one was normal.",
+]
+
+
+def log_payload(count: int, seed: int = 0) -> bytes:
+    """
+    JSON body shaped like a `get_logs` response with `count` logs.
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    logs = []
+    for n in range(count):
+        date = start + timedelta(hours=n * 6, minutes=rng.randint(0, 59))
+        logs.append(
+            {
+                "id": str(ObjectId()),
+                "user_id": "PzWNrUTcE2fXNXe0EwuRVe4TaVD2",
+                "name": rng.choice(["Biscuit", "Waffles"]),
+                "type": rng.choice(["pee", "poop"]),
+                "date": date.isoformat(),
+                "note": rng.choice(NOTES),
+                "created_at": date.isoformat(),
+                "updated_at": None,
+            }
+        )
+
+    return json.dumps(logs, separators=(",", ":")).encode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500, 5000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    compressors = available_compressors()
+
+    print(
+        f"{'logs':>6} {'encoding':>8} {'bytes':>9} {'compressed':>10} "
+        f"{'saved':>6} {'cold_ms':>8} {'cached_ms':>9} {'MB/s':>7}"
+    )
+    for size in args.sizes:
+        body = log_payload(size)
+
+        for encoding in compressors:
+            cold = CompressedCache(0, compressors)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                compressed = cold.get(encoding, body)
+            cold_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+            cached = CompressedCache(1, compressors)
+            cached.get(encoding, body)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                cached.get(encoding, body)
+            cached_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+            saved = 1 - len(compressed) / len(body)
+            throughput = len(body) / (cold_ms / 1000) / 1_000_000
+            print(
+                f"{size:>6} {encoding:>8} {len(body):>9} {len(compressed):>10} "
+                f"{saved:>6.1%} {cold_ms:>8.3f} {cached_ms:>9.3f} {throughput:>7.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
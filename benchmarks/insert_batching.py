@@ -0,0 +1,128 @@
+"""
+Compare log insert throughput with and without group commit.
+
+Runs bursts of concurrent inserts through `InsertBatcher` at several batch
+windows against a real MongoDB, or against an in-memory collection that
+holds one of a few pooled connections for a simulated round trip on every
+call.
+
+    $ uv run python -m benchmarks.insert_batching --uri mongodb://localhost:27017
+    $ uv run python -m benchmarks.insert_batching --round-trip-ms 2
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from app.utilities.batching import InsertBatcher
+
+
+class SlowCollection:
+    """
+    In-memory collection that holds a pooled connection for `round_trip`
+    seconds per call.
+    """
+
+    def __init__(self, collection: Any, round_trip: float, pool_size: int) -> None:
+        self.collection = collection
+        self.round_trip = round_trip
+        self.pool = asyncio.Semaphore(pool_size)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+    async def insert_one(self, doc: dict[str, Any], **kwargs: Any) -> Any:
+        async with self.pool:
+            await asyncio.sleep(self.round_trip)
+            return await self.collection.insert_one(doc, **kwargs)
+
+    async def insert_many(self, docs: list[dict[str, Any]], **kwargs: Any) -> Any:
+        async with self.pool:
+            await asyncio.sleep(self.round_trip)
+            return await self.collection.insert_many(docs, **kwargs)
+
+
+def get_collection(uri: str | None, round_trip_ms: float, pool_size: int) -> Any:
+    if uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        return AsyncIOMotorClient(uri)["poopyrus_bench"]["logs"]
+
+    from mongomock_motor import AsyncMongoMockClient
+
+    return SlowCollection(
+        AsyncMongoMockClient()["poopyrus_bench"]["logs"],
+        round_trip_ms / 1000,
+        pool_size,
+    )
+
+
+def new_log(n: int) -> dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    return {
+        "name": f"bench {n}",
+        "type": "pee",
+        "date": now,
+        "user_id": "bench",
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def run(
+    collection: Any, batch_size: int, window_ms: float, total: int, concurrency: int
+) -> float:
+    """
+    Insert `total` logs from `concurrency` writers, returning inserts per second.
+    """
+    batcher = InsertBatcher(
+        lambda: collection, max_size=batch_size, max_delay_ms=window_ms
+    )
+    if batch_size > 1:
+        batcher.start()
+
+    counter = iter(range(total))
+
+    async def writer() -> None:
+        for n in counter:
+            await batcher.insert(new_log(n))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[writer() for _ in range(concurrency)])
+    await batcher.stop()
+
+    return total / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--uri", help="MongoDB URI, defaults to a simulated server")
+    parser.add_argument("--round-trip-ms", type=float, default=1.0)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--total", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument(
+        "--windows", type=float, nargs="+", default=[0.5, 1, 2, 5, 10, 20]
+    )
+    args = parser.parse_args()
+
+    collection = get_collection(args.uri, args.round_trip_ms, args.pool_size)
+
+    baseline = await run(collection, 1, 0, args.total, args.concurrency)
+    print(f"{'window_ms':>10} {'inserts/s':>12} {'speedup':>8}")
+    print(f"{'insert_one':>10} {baseline:>12.0f} {1:>8.2f}")
+
+    for window_ms in args.windows:
+        rate = await run(
+            collection, args.batch_size, window_ms, args.total, args.concurrency
+        )
+        print(f"{window_ms:>10} {rate:>12.0f} {rate / baseline:>8.2f}")
+
+    await collection.delete_many({"user_id": "bench"})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+Report how long importing the app takes, and which modules it spends it on.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter a
+few times and prints the total along with the slowest modules from the
+fastest run, so cold start can be compared between commits.
+
+    $ uv run python scripts/importtime.py
+    $ uv run python scripts/importtime.py --module app.serve --top 30 --json
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+@dataclass
+class ModuleTime:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def profile(module: str) -> list[ModuleTime]:
+    """
+    Import `module` in a fresh interpreter and parse its importtime output.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=os.environ | {"PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times.append(
+                ModuleTime(
+                    name=name,
+                    self_us=int(self_us),
+                    cumulative_us=int(cumulative_us),
+                    depth=len(indent) // 2,
+                )
+            )
+
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print JSON instead")
+    args = parser.parse_args()
+
+    runs = [profile(args.module) for _ in range(args.runs)]
+    totals = [sum(t.self_us for t in run) for run in runs]
+    fastest = runs[totals.index(min(totals))]
+
+    # Top level packages, so "pymongo" covers everything pymongo pulled in.
+    packages = sorted(
+        (t for t in fastest if t.depth <= 1), key=lambda t: -t.cumulative_us
+    )[: args.top]
+
+    if args.json:
+        report = {
+            "module": args.module,
+            "total_us": min(totals),
+            "runs_us": totals,
+            "packages": [asdict(t) for t in packages],
+        }
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"import {args.module}: {min(totals) / 1000:.1f} ms (best of {args.runs})")
+    print(f"{'cumulative_ms':>14} {'self_ms':>8}  module")
+    for t in packages:
+        print(f"{t.cumulative_us / 1000:>14.1f} {t.self_us / 1000:>8.1f}  {t.name}")
+
+
+if __name__ == "__main__":
+    main()